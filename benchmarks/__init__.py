@@ -0,0 +1,18 @@
+"""
+Benchmarks for FunGraphics.
+
+Time every drawing method and the frame loop, for several numbers of shapes
+per frame, and compare the results with a stored baseline:
+
+    python -m benchmarks --backend numpy --json results.json
+    python -m benchmarks --baseline results.json --threshold 0.15
+    xvfb-run python -m benchmarks --target single
+
+--target src measures the package in src/, --target single the standalone
+fungraphics.py. See python -m benchmarks --help for all the options.
+
+benchmarks.scenes runs the programs of examples/ with scripted input and
+reports their frame time distributions (python -m benchmarks.scenes --help).
+benchmarks.startup checks the time budgets of `import fungraphics` and of
+the first frame.
+"""
@@ -0,0 +1,59 @@
+"""
+Command line of the benchmarks: python -m benchmarks --help
+"""
+import argparse
+import json
+import sys
+
+from .runner import compare, report, run_benchmarks
+from .targets import TARGETS, create_graphics, load_target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Time the FunGraphics drawing methods and frame loop.")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="src",
+                        help="build to measure: the src package or the single-file fungraphics.py")
+    parser.add_argument("--backend", default="tk",
+                        help="tk (needs a display, e.g. xvfb-run) or numpy (headless)")
+    parser.add_argument("--retained", action="store_true", help="measure retained mode")
+    parser.add_argument("--sizes", default="10,100,1000", help="shapes per frame, comma separated")
+    parser.add_argument("--repeats", type=int, default=5, help="measured frames per benchmark and size")
+    parser.add_argument("--only", default="", help="comma separated benchmark names")
+    parser.add_argument("--size", default="800x600", help="window size")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results stored in this file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="regression threshold, as a fraction of the baseline (default 0.10)")
+    args = parser.parse_args(argv)
+
+    module = load_target(args.target)
+    width, height = (int(v) for v in args.size.split("x"))
+    try:
+        fg = create_graphics(module, width, height, args.backend, retained=args.retained)
+    except ValueError as e:
+        parser.error(f"--target {args.target} --backend {args.backend}: {e}")
+    sizes = [int(n) for n in args.sizes.split(",")]
+    names = [name for name in args.only.split(",") if name]
+
+    results = run_benchmarks(fg, module, sizes, args.repeats, names)
+    document = report(args.target, args.backend, {"retained": args.retained, "size": args.size}, results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, metric, reference, value in regressions:
+            print(f"REGRESSION {name} n={size} {metric}: {reference:.6g} -> {value:.6g}")
+        if regressions:
+            return 1
+        print(f"No regression above {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Micro-benchmark of color conversion.
+
+Compares the original per-call formatting of colors with the cached
+conversion used by FunGraphics, in calls per second. No window is needed.
+
+    python benchmarks/bench_colors.py
+"""
+import os
+import sys
+import timeit
+
+# Add src to path to import fungraphics
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fungraphics.fun_graphics import _color_to_hex, _hex_to_bytes
+
+
+def uncached_rgb_to_hex(color):
+    """Conversion done by FunGraphics before colors were cached."""
+    if len(color) >= 3:
+        return "#%02x%02x%02x" % (color[0], color[1], color[2])
+    return "#000000"
+
+
+def calls_per_second(func, args, number=200000):
+    best = min(timeit.repeat(lambda: func(*args), number=number, repeat=5))
+    return number / best
+
+
+def main():
+    cases = [
+        ("tuple (before)", uncached_rgb_to_hex, ((255, 136, 0),)),
+        ("tuple (cached)", _color_to_hex, ((255, 136, 0),)),
+        ("packed int (cached)", _color_to_hex, (0xFF8800,)),
+        ("palette name (cached)", _color_to_hex, ("orange",)),
+        ("pixel bytes (before)", lambda c: bytes.fromhex(uncached_rgb_to_hex(c)[1:]), ((255, 136, 0),)),
+        ("pixel bytes (cached)", lambda c: _hex_to_bytes(_color_to_hex(c)), ((255, 136, 0),)),
+    ]
+    for name, func, args in cases:
+        print(f"{name:24s} {calls_per_second(func, args):14,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+One benchmark per public FunGraphics drawing method.
+
+Each benchmark draws n shapes (or makes n calls) into a cleared frame. Shapes
+are spread over the window deterministically so that every run draws the
+same frames. Benchmarks whose methods a build does not have are skipped.
+"""
+import math
+
+BENCHMARKS = {}  # name -> (required methods, function(fg, n, assets))
+
+
+def benchmark(name, *requires):
+    """Register a benchmark, run only if the build has the required methods (default: name)."""
+    def register(function):
+        BENCHMARKS[name] = (requires or (name,), function)
+        return function
+    return register
+
+
+def positions(fg, n, margin=40):
+    """n positions spread over the window."""
+    columns = max(1, int(math.sqrt(n)))
+    width, height = fg.width - margin, fg.height - margin
+    return [((i % columns) * width // columns, (i // columns) * height // max(1, (n + columns - 1) // columns))
+            for i in range(n)]
+
+
+def columns(fg, n):
+    xs, ys = zip(*positions(fg, n))
+    return list(xs), list(ys)
+
+
+@benchmark("setColor")
+def bench_set_color(fg, n, assets):
+    colors = [(i % 256, 128, 255 - i % 256) for i in range(64)]
+    for i in range(n):
+        fg.setColor(colors[i % 64])
+
+
+@benchmark("setPixel")
+def bench_set_pixel(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.setPixel(x, y)
+
+
+@benchmark("drawLine")
+def bench_draw_line(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawLine(x, y, x + 30, y + 20)
+
+
+@benchmark("drawRect")
+def bench_draw_rect(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawRect(x, y, 20, 15)
+
+
+@benchmark("drawFillRect")
+def bench_draw_fill_rect(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawFillRect(x, y, 20, 15)
+
+
+@benchmark("drawCircle")
+def bench_draw_circle(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawCircle(x, y, 20)
+
+
+@benchmark("drawFilledCircle")
+def bench_draw_filled_circle(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawFilledCircle(x, y, 20)
+
+
+@benchmark("drawFilledOval")
+def bench_draw_filled_oval(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawFilledOval(x, y, 30, 15)
+
+
+@benchmark("drawPolygon")
+def bench_draw_polygon(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawPolygon([(x, y), (x + 20, y), (x + 10, y + 20)])
+
+
+@benchmark("drawFilledPolygon")
+def bench_draw_filled_polygon(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawFilledPolygon([(x, y), (x + 20, y), (x + 10, y + 20)])
+
+
+@benchmark("drawString")
+def bench_draw_string(fg, n, assets):
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.drawString(x, y, f"Text {i % 100}", font_size=12)
+
+
+@benchmark("drawStringAligned")
+def bench_draw_string_aligned(fg, n, assets):
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.drawStringAligned(x + 20, y + 10, f"Text {i % 100}", font_size=12, halign="center", valign="center")
+
+
+@benchmark("drawFancyString")
+def bench_draw_fancy_string(fg, n, assets):
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.drawFancyString(x, y, f"Fancy {i % 10}", font_size=14, outline_thickness=1)
+
+
+@benchmark("getStringSize")
+def bench_get_string_size(fg, n, assets):
+    for i in range(n):
+        fg.getStringSize(f"Text {i % 100}", 12)
+
+
+@benchmark("drawPicture")
+def bench_draw_picture(fg, n, assets):
+    for x, y in positions(fg, n):
+        fg.drawPicture(x + 16, y + 16, assets["bitmap"])
+
+
+@benchmark("drawTransformedPicture")
+def bench_draw_transformed_picture(fg, n, assets):
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.drawTransformedPicture(x + 16, y + 16, assets["bitmap"], angle=(i * 15) % 360, scale=1.5)
+
+
+@benchmark("drawMirroredPicture")
+def bench_draw_mirrored_picture(fg, n, assets):
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.drawMirroredPicture(x + 16, y + 16, assets["bitmap"], i % 2 == 0)
+
+
+# Batch methods: n shapes in one call
+
+@benchmark("setPixels")
+def bench_set_pixels(fg, n, assets):
+    xs, ys = columns(fg, n)
+    fg.setPixels(xs, ys)
+
+
+@benchmark("drawLines")
+def bench_draw_lines(fg, n, assets):
+    xs, ys = columns(fg, n)
+    fg.drawLines(xs, ys, [x + 30 for x in xs], [y + 20 for y in ys])
+
+
+@benchmark("drawRects")
+def bench_draw_rects(fg, n, assets):
+    xs, ys = columns(fg, n)
+    fg.drawRects(xs, ys, 20, 15)
+
+
+@benchmark("drawCircles")
+def bench_draw_circles(fg, n, assets):
+    xs, ys = columns(fg, n)
+    fg.drawCircles(xs, ys, 20)
+
+
+@benchmark("drawPoints")
+def bench_draw_points(fg, n, assets):
+    xs, ys = columns(fg, n)
+    fg.drawPoints(xs, ys, size=2)
+
+
+@benchmark("drawPolyline")
+def bench_draw_polyline(fg, n, assets):
+    xs = [i * fg.width / n for i in range(n)]
+    ys = [fg.height / 2 + math.sin(i / 10) * fg.height / 3 for i in range(n)]
+    fg.drawPolyline(xs, ys)
+
+
+@benchmark("drawDisplayList", "beginDisplayList", "endDisplayList", "drawDisplayList")
+def bench_draw_display_list(fg, n, assets):
+    display_list = assets.get(("display_list", n))
+    if display_list is None:
+        fg.beginDisplayList()
+        bench_draw_fill_rect(fg, n, assets)
+        display_list = assets[("display_list", n)] = fg.endDisplayList()
+    fg.drawDisplayList(display_list)
+
+
+@benchmark("blitArray")
+def bench_blit_array(fg, n, assets):
+    # n is the side of the array, in pixels
+    import numpy as np
+    pixels = assets.get(("pixels", n))
+    if pixels is None:
+        pixels = assets[("pixels", n)] = np.random.default_rng(0).integers(0, 256, (n, n, 3), dtype=np.uint8)
+    fg.blitArray(pixels, 0, 0)
+
+
+@benchmark("syncGameLogic", "syncGameLogic", "drawFillRect", "drawLine", "drawString")
+def bench_frame(fg, n, assets):
+    # A mixed scene of n shapes, to measure the frame loop (sync_time)
+    for i, (x, y) in enumerate(positions(fg, n)):
+        if i % 3 == 0:
+            fg.drawFillRect(x, y, 20, 15)
+        elif i % 3 == 1:
+            fg.drawLine(x, y, x + 30, y + 20)
+        else:
+            fg.drawString(x, y, "Score", font_size=12)
+
+
+@benchmark("pick", "setPickId", "pick")
+def bench_pick(fg, n, assets):
+    # n shapes with pick ids, then n picks
+    for i, (x, y) in enumerate(positions(fg, n)):
+        fg.setPickId(i)
+        fg.drawFillRect(x, y, 20, 15)
+    fg.setPickId(None)
+    for x, y in positions(fg, n):
+        fg.pick(x + 5, y + 5)
@@ -0,0 +1,116 @@
+"""
+Running the benchmarks and comparing results with a baseline.
+"""
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from .primitives import BENCHMARKS
+
+# syncGameLogic is called with this frame rate, so that it never sleeps
+UNLIMITED_FPS = 1e9
+
+
+def make_assets(module):
+    """Images used by the picture benchmarks (none without Pillow)."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return {}
+    image = Image.new("RGBA", (32, 32), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((2, 2, 29, 29), fill=(255, 160, 0, 255), outline=(0, 0, 0, 255))
+    path = os.path.join(tempfile.mkdtemp(prefix="fungraphics-bench-"), "sprite.png")
+    image.save(path)
+    # GraphicsBitmap treats paths starting with / as relative resources
+    return {"bitmap": module.GraphicsBitmap(os.path.relpath(path))}
+
+
+def run_benchmark(fg, function, n, assets, repeats):
+    """
+    Draw `repeats` frames (after one warm-up frame) and return the medians of
+    the time spent drawing, in syncGameLogic (and rendering, headless) and in
+    the whole frame, in seconds.
+    """
+    draw_times, sync_times = [], []
+    render = getattr(fg, "backend", "tk") != "tk"
+    for frame in range(repeats + 1):
+        fg.clear()
+        start = time.perf_counter()
+        function(fg, n, assets)
+        drawn = time.perf_counter()
+        fg.syncGameLogic(UNLIMITED_FPS)
+        if render:
+            fg.getArray()
+        synced = time.perf_counter()
+        if frame:
+            draw_times.append(drawn - start)
+            sync_times.append(synced - drawn)
+    draw_time, sync_time = statistics.median(draw_times), statistics.median(sync_times)
+    return {
+        "ops_per_sec": n / draw_time if draw_time > 0 else float("inf"),
+        "draw_time": draw_time,
+        "sync_time": sync_time,
+        "frame_time": statistics.median(d + s for d, s in zip(draw_times, sync_times)),
+    }
+
+
+def run_benchmarks(fg, module, sizes, repeats=5, names=None, log=print):
+    """Run the benchmarks the build supports; returns {name: {size: result}}."""
+    assets = make_assets(module)
+    results = {}
+    for name, (requires, function) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        if not all(hasattr(fg, method) for method in requires):
+            log(f"{name:24s} skipped (not in this build)")
+            continue
+        if "picture" in name.lower() and "bitmap" not in assets:
+            log(f"{name:24s} skipped (requires Pillow)")
+            continue
+        results[name] = {}
+        for n in sizes:
+            try:
+                result = run_benchmark(fg, function, n, assets, repeats)
+            except ImportError as e:
+                log(f"{name:24s} skipped ({e})")
+                del results[name]
+                break
+            results[name][str(n)] = result
+            log(f"{name:24s} n={n:<6d} {result['ops_per_sec']:14,.0f} ops/s"
+                f"  frame {result['frame_time'] * 1000:9.3f} ms")
+    return results
+
+
+def report(target, backend, options, results):
+    """The JSON document of a run."""
+    return {
+        "target": target,
+        "backend": backend,
+        "options": options,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline run. Returns the regressions as
+    (name, size, metric, baseline value, value): fewer ops/s or longer frames
+    than the baseline by more than threshold (a fraction).
+    """
+    regressions = []
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            reference = baseline.get("results", {}).get(name, {}).get(size)
+            if reference is None:
+                continue
+            if result["ops_per_sec"] < reference["ops_per_sec"] * (1 - threshold):
+                regressions.append((name, size, "ops_per_sec", reference["ops_per_sec"], result["ops_per_sec"]))
+            if result["frame_time"] > reference["frame_time"] * (1 + threshold):
+                regressions.append((name, size, "frame_time", reference["frame_time"], result["frame_time"]))
+    return regressions
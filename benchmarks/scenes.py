@@ -0,0 +1,272 @@
+"""
+End-to-end benchmarks: the example programs, driven by scripted input.
+
+Each scene runs an unmodified program of examples/ for a number of frames.
+Clicks, mouse motion and key presses are injected between frames and the
+dialogs of hangman.py are answered automatically, so every run draws the
+same frames. Reported per scene: the frame time distribution, the number of
+canvas items and, headless, the time to rasterize the frames. With --checksums
+a SHA-256 of every frame is stored, which --reference compares with a previous
+run (visual regression); --dump saves the frames as PNGs.
+
+    python -m benchmarks.scenes --backend numpy --frames 300 --json scenes.json
+    python -m benchmarks.scenes --backend numpy --checksums --reference scenes.json
+    xvfb-run python -m benchmarks.scenes --scene demofull --dump frames/ --dump-every 30
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import runpy
+import statistics
+import sys
+import time
+
+from .runner import UNLIMITED_FPS
+from .targets import ROOT, load_target
+
+EXAMPLES = os.path.join(ROOT, "examples")
+
+
+class SceneFinished(Exception):
+    """Raised from syncGameLogic to leave the program's game loop."""
+
+
+# Input scripts: frame number -> events injected after that frame, as
+# ("move", x, y), ("click", x, y, button), ("press", key) or ("release", key)
+
+def demofull_events(frame):
+    # The mouse circles around the window; a click every 40 frames shows the next demo
+    x = int(400 + 250 * math.cos(frame / 20))
+    y = int(300 + 200 * math.sin(frame / 20))
+    events = [("move", x, y)]
+    if frame % 40 == 39:
+        events.append(("click", x, y, 1))
+    return events
+
+
+def demo_events(frame):
+    # Grow the circle with Left for 30 frames, then shrink it with Right
+    return {0: [("press", "Left")], 30: [("release", "Left")],
+            45: [("press", "Right")], 75: [("release", "Right")]}.get(frame % 90, [])
+
+
+def no_events(frame):
+    return []
+
+
+class HangmanAnswers:
+    """Answers of the hangman dialogs: a word per game, then its letters in order of frequency."""
+    WORDS = ["python", "graphics", "canvas", "benchmark", "jazz"]
+    LETTERS = "etaoinshrdlcumwfgypbvkjxqz"
+
+    def __init__(self):
+        self.games = 0
+        self.letters = iter(())
+
+    def get_hidden_string(self, message):
+        word = self.WORDS[self.games % len(self.WORDS)]
+        self.games += 1
+        self.letters = iter(self.LETTERS)
+        return word
+
+    def get_char(self, message):
+        if "again" in message.lower():
+            return "y"
+        return next(self.letters, "z")
+
+    def display_message(self, message):
+        pass
+
+
+SCENES = {
+    # name: (program in examples/, input script, dialog answers class or None)
+    "demofull": ("demofull.py", demofull_events, None),
+    "demo": ("demo.py", demo_events, None),
+    "hangman": ("hangman.py", no_events, HangmanAnswers),
+}
+
+
+def _generate(fg, event):
+    """Inject an input event into the window, as if it came from the user."""
+    kind = event[0]
+    tk = fg.backend == "tk"
+    if kind == "move":
+        fg.canvas.event_generate("<Motion>", x=event[1], y=event[2])
+    elif kind == "click":
+        _, x, y, button = event
+        if tk:
+            fg.canvas.event_generate(f"<ButtonPress-{button}>", x=x, y=y)
+            fg.canvas.event_generate(f"<ButtonRelease-{button}>", x=x, y=y)
+        else:
+            fg.canvas.event_generate("<Button>", x=x, y=y, num=button)
+            fg.canvas.event_generate("<ButtonRelease>", x=x, y=y, num=button)
+    else:
+        sequence = "<KeyPress>" if kind == "press" else "<KeyRelease>"
+        fg.root.event_generate(sequence, keysym=event[1])
+
+
+def _distribution(values):
+    """Mean, percentiles and maximum of a list of numbers."""
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def percentile(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+    return {"mean": statistics.fmean(values), "p50": percentile(0.50), "p95": percentile(0.95),
+            "p99": percentile(0.99), "max": values[-1]}
+
+
+def run_scene(module, name, frames, backend="numpy", warmup=10, paced=False,
+              checksums=False, dump=None, dump_every=1, verbose=False):
+    """
+    Run a scene for warmup + frames frames and return its measurements.
+    paced: keep the frame rate of the program (default: as fast as possible)
+    dump: directory where frames are saved as PNGs, every dump_every frames
+    """
+    FunGraphics = module.FunGraphics
+    program, events, answers = SCENES[name]
+    state = {"frame": 0, "fg": None}
+    samples = {"frame_time": [], "user_time": [], "sync_time": [], "items": [], "items_created": []}
+    if backend != "tk":
+        # Headless frames are only rasterized on demand: time it separately
+        samples["render_time"] = []
+    frame_checksums = []
+    real_sync = FunGraphics.syncGameLogic
+
+    def sync(fg, fps):
+        state["fg"] = fg
+        dt = real_sync(fg, fps if paced else UNLIMITED_FPS)
+        frame = state["frame"]
+        state["frame"] = frame + 1
+        # Measuring and hashing the frame is not part of the program's next frame
+        start = time.perf_counter()
+        if frame >= warmup:
+            stats = fg.getFrameStats()
+            for key in ("frame_time", "user_time", "sync_time", "items_created"):
+                samples[key].append(stats[key])
+            samples["items"].append(len(fg.canvas.find_all()))
+            pixels = None
+            if backend != "tk":
+                render_start = time.perf_counter()
+                pixels = fg.getArray()
+                samples["render_time"].append(time.perf_counter() - render_start)
+            if checksums or dump:
+                if pixels is None:
+                    pixels = fg._render_offscreen()
+                frame_checksums.append(hashlib.sha256(pixels.tobytes()).hexdigest())
+                if dump and (frame - warmup) % dump_every == 0:
+                    from PIL import Image
+                    Image.fromarray(pixels[:, :, :3]).save(
+                        os.path.join(dump, f"{name}-{frame - warmup:05d}.png"))
+        if frame + 1 >= warmup + frames:
+            raise SceneFinished()
+        fg._last_sync += time.perf_counter() - start
+        for event in events(frame):
+            _generate(fg, event)
+        return dt
+
+    patched = [(FunGraphics, "syncGameLogic", real_sync),
+               (FunGraphics, "default_backend", FunGraphics.default_backend)]
+    if answers is not None:
+        sys.path.insert(0, EXAMPLES)
+        from dialogs import Dialogs
+        script = answers()
+        for method in ("get_hidden_string", "get_char", "display_message"):
+            patched.append((Dialogs, method, Dialogs.__dict__[method]))
+            setattr(Dialogs, method, staticmethod(getattr(script, method)))
+    FunGraphics.syncGameLogic = sync
+    FunGraphics.default_backend = backend
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            runpy.run_path(os.path.join(EXAMPLES, program), run_name="__main__")
+    except SceneFinished:
+        pass
+    finally:
+        for owner, attribute, value in patched:
+            setattr(owner, attribute, value)
+        if state["fg"] is not None and backend == "tk":
+            state["fg"].root.destroy()
+
+    result = {"frames": len(samples["frame_time"])}
+    for key, values in samples.items():
+        result[key] = _distribution(values)
+    if frame_checksums:
+        result["checksums"] = frame_checksums
+    return result
+
+
+def compare_checksums(results, reference):
+    """The frames whose checksums differ from the reference run: {scene: [frame numbers]}."""
+    changed = {}
+    for name, result in results.items():
+        expected = reference.get("results", {}).get(name, {}).get("checksums")
+        if expected is None or "checksums" not in result:
+            continue
+        frames = [i for i, (a, b) in enumerate(zip(result["checksums"], expected)) if a != b]
+        if frames:
+            changed[name] = frames
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scenes",
+                                     description="Run the example programs with scripted input and time their frames.")
+    parser.add_argument("--scene", action="append", choices=sorted(SCENES),
+                        help="scene to run (repeatable, default: all)")
+    parser.add_argument("--backend", default="tk",
+                        help="tk (needs a display, e.g. xvfb-run) or numpy (headless)")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per scene")
+    parser.add_argument("--warmup", type=int, default=10, help="frames run before measuring")
+    parser.add_argument("--paced", action="store_true",
+                        help="keep the programs' frame rates instead of running as fast as possible")
+    parser.add_argument("--checksums", action="store_true", help="store a SHA-256 of every frame")
+    parser.add_argument("--dump", help="save the frames as PNGs in this directory")
+    parser.add_argument("--dump-every", type=int, default=1, help="save one frame in this many")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--reference", help="compare the frame checksums with this results file")
+    parser.add_argument("--verbose", action="store_true", help="show what the programs print")
+    args = parser.parse_args(argv)
+
+    module = load_target("src")
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+    checksums = args.checksums or bool(args.reference)
+    results = {}
+    for name in args.scene or list(SCENES):
+        result = results[name] = run_scene(module, name, args.frames, args.backend, args.warmup, args.paced,
+                                           checksums, args.dump, args.dump_every, args.verbose)
+        frame_time, items = result["frame_time"], result["items"]
+        print(f"{name:10s} {result['frames']} frames  frame p50 {frame_time['p50'] * 1000:.3f} ms"
+              f"  p95 {frame_time['p95'] * 1000:.3f} ms  max {frame_time['max'] * 1000:.3f} ms"
+              f"  items mean {items['mean']:.0f} max {items['max']}")
+        if "render_time" in result:
+            print(f"{'':10s} render p50 {result['render_time']['p50'] * 1000:.3f} ms"
+                  f"  p95 {result['render_time']['p95'] * 1000:.3f} ms")
+
+    if args.json:
+        document = {"backend": args.backend, "frames": args.frames, "paced": args.paced,
+                    "python": sys.version.split()[0], "results": results}
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.reference:
+        with open(args.reference) as f:
+            reference = json.load(f)
+        changed = compare_checksums(results, reference)
+        for name, frames in changed.items():
+            print(f"CHANGED {name}: {len(frames)} frames differ, first {frames[:10]}")
+        if changed:
+            return 1
+        print(f"All frames match {args.reference}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
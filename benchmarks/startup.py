@@ -0,0 +1,112 @@
+"""
+Startup budget: how long `import fungraphics` and the first frame take.
+
+Each measurement runs in a fresh interpreter. The import is timed with
+python -X importtime, which also lists the imported modules: importing the
+package must not load tkinter, PIL or numpy, they are only loaded by the
+windows and drawing methods that need them. The first frame is the time from
+the end of the import to a FunGraphics window showing a few shapes and text.
+
+    python -m benchmarks.startup --backend numpy
+    xvfb-run python -m benchmarks.startup --import-budget 20 --frame-budget 300
+
+Exits with status 1 when a median goes over its budget (in milliseconds).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from .targets import ROOT
+
+SRC = os.path.join(ROOT, "src")
+
+# Modules that `import fungraphics` must leave to first use
+LAZY_MODULES = ("tkinter", "PIL", "numpy")
+
+FIRST_FRAME = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import fungraphics
+imported = time.perf_counter()
+fg = fungraphics.FunGraphics(640, 480, backend={backend!r})
+fg.setColor((255, 0, 0))
+fg.drawFilledCircle(20, 20, 60)
+fg.drawString(20, 120, "FunGraphics", font_size=20)
+fg.syncGameLogic(1e9)
+if fg.backend != "tk":
+    fg.getArray()
+print(json.dumps({{"import": imported - start, "first_frame": time.perf_counter() - imported}}))
+"""
+
+
+def _run(code, *options, env=None):
+    return subprocess.run([sys.executable, *options, "-c", code], capture_output=True, text=True,
+                          env=env, check=True)
+
+
+def measure_import():
+    """(cumulative import time in seconds, names of the modules it imported)."""
+    result = _run(f"import sys; sys.path.insert(0, {SRC!r}); import fungraphics", "-X", "importtime")
+    modules, total = set(), None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        name = name.strip()
+        modules.add(name)
+        if name == "fungraphics":
+            total = int(cumulative) / 1e6
+    return total, modules
+
+
+def measure_first_frame(backend):
+    """(import time, time from the import to the first frame shown) in seconds."""
+    result = _run(FIRST_FRAME.format(src=SRC, backend=backend))
+    times = json.loads(result.stdout.strip().splitlines()[-1])
+    return times["import"], times["first_frame"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Check that importing fungraphics and the first frame stay fast.")
+    parser.add_argument("--backend", default="tk",
+                        help="backend of the first frame: tk (needs a display) or numpy (headless)")
+    parser.add_argument("--repeats", type=int, default=7, help="interpreters started per measurement")
+    parser.add_argument("--import-budget", type=float, default=20.0, help="budget of the import, in ms")
+    parser.add_argument("--frame-budget", type=float, default=500.0, help="budget of the first frame, in ms")
+    args = parser.parse_args(argv)
+
+    # One run with bytecode writing allowed, so that the timings do not include compiling
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    _run(f"import sys; sys.path.insert(0, {SRC!r}); import fungraphics", env=env)
+
+    import_times, frame_times, eager = [], [], set()
+    for _ in range(args.repeats):
+        total, modules = measure_import()
+        import_times.append(total)
+        eager |= {name for name in modules if name.split(".")[0] in LAZY_MODULES}
+        frame_times.append(measure_first_frame(args.backend)[1])
+    import_time, first_frame = statistics.median(import_times) * 1000, statistics.median(frame_times) * 1000
+
+    failures = []
+    print(f"import fungraphics  {import_time:8.2f} ms  (budget {args.import_budget:g} ms)")
+    print(f"first frame ({args.backend})  {first_frame:8.2f} ms  (budget {args.frame_budget:g} ms)")
+    if import_time > args.import_budget:
+        failures.append("import over budget")
+    if first_frame > args.frame_budget:
+        failures.append("first frame over budget")
+    if eager:
+        failures.append("imported eagerly: " + ", ".join(sorted(eager)))
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+The FunGraphics builds the benchmarks can measure.
+"""
+import importlib.util
+import inspect
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "src": os.path.join(ROOT, "src", "fungraphics", "__init__.py"),
+    "single": os.path.join(ROOT, "fungraphics.py"),
+}
+
+
+def load_target(name):
+    """Import a build of FunGraphics: "src" (the package) or "single" (fungraphics.py)."""
+    if name == "src":
+        sys.path.insert(0, os.path.join(ROOT, "src"))
+        import fungraphics
+        return fungraphics
+    spec = importlib.util.spec_from_file_location("fungraphics_single", TARGETS[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_graphics(module, width, height, backend="tk", **options):
+    """
+    Create a FunGraphics window of a build, with the options it supports.
+    Raises ValueError if the build has no such backend.
+    """
+    parameters = inspect.signature(module.FunGraphics).parameters
+    kwargs = {name: value for name, value in options.items() if name in parameters}
+    if backend != "tk":
+        if "backend" not in parameters:
+            raise ValueError(f"This build of FunGraphics has no {backend!r} backend")
+        kwargs["backend"] = backend
+    return module.FunGraphics(width, height, title="FunGraphics benchmark", **kwargs)
@@ -61,6 +61,8 @@ class DemoFull:
             if self.last_click and self.last_click[2] == MOUSE_BUTTON_LEFT:
                 self.current_demo = (self.current_demo + 1) % len(self.demos)
                 self.last_click = None
+                # The background layer is not erased by clear()
+                self.fg.clearBackground()
                 self.frame = 0
             
             self.frame += 1
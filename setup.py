@@ -35,5 +35,6 @@ setup(
     ],
     extras_require={
         "imaging": ["Pillow>=9.0.0"],  # Optional for PNG export and image transformations
+        "headless": ["numpy>=1.17"],  # Optional for the headless "numpy" backend
     },
 )
@@ -1,7 +1,9 @@
 from .fun_graphics import (
-    FunGraphics, 
+    FunGraphics, KeyEvent, MouseEvent,
     K_s, K_LEFT, K_RIGHT, K_UP, K_DOWN, K_SPACE,
     ALIGN_LEFT, ALIGN_CENTER, ALIGN_RIGHT, ALIGN_TOP, ALIGN_BOTTOM,
-    MOUSE_BUTTON_LEFT, MOUSE_BUTTON_MIDDLE, MOUSE_BUTTON_RIGHT
+    MOUSE_BUTTON_LEFT, MOUSE_BUTTON_MIDDLE, MOUSE_BUTTON_RIGHT,
+    PALETTE
 )
 from .utils import GraphicsBitmap
+from .command_buffer import CommandBuffer
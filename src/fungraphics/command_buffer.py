@@ -0,0 +1,69 @@
+"""
+Command buffers for FunGraphics.
+
+Tk may only be called from the thread that created the window. A
+CommandBuffer records drawing calls on any thread, without touching Tk; the
+recorded frame is then handed to FunGraphics.submitFrame, and the window's
+thread replays it at its next syncGameLogic.
+
+    frame = CommandBuffer()
+    frame.clear()
+    frame.setColor((255, 0, 0))
+    frame.drawFilledCircle(x, y, 20)
+    fg.submitFrame(frame)
+
+At most SUBMITTED_FRAMES frames wait to be drawn: a thread producing frames
+faster than the window shows them waits in submitFrame (or gets False back
+with block=False), so it never runs more than that many frames ahead.
+"""
+
+# FunGraphics methods a CommandBuffer can record
+RECORDABLE = (
+    "clear", "setColor", "setPenWidth", "setPixel", "setPixels", "blitArray",
+    "drawLine", "drawRect", "drawFillRect", "drawCircle", "drawFilledCircle",
+    "drawFilledOval", "drawPolygon", "drawFilledPolygon",
+    "drawPolyline", "drawLines", "drawRects", "drawCircles", "drawPoints",
+    "drawString", "drawStringAligned", "drawFancyString",
+    "drawPicture", "drawTransformedPicture", "drawMirroredPicture",
+    "drawBackground", "drawForeground", "clearBackground",
+)
+
+
+class CommandBuffer:
+    """
+    Drawing calls recorded for later, with the same methods as FunGraphics.
+    Arguments are kept as they are: arrays and lists passed to a buffer must
+    not be modified until the frame has been drawn.
+    """
+    __slots__ = ("commands",)
+
+    def __init__(self):
+        self.commands = []  # (method name, args, kwargs)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def reset(self):
+        """
+        Remove the recorded calls, to record a new frame in the same buffer.
+        A frame already submitted is not affected.
+        """
+        self.commands = []
+
+    def replay(self, fg):
+        """Make the recorded calls on a FunGraphics (from the thread of its window)."""
+        for name, args, kwargs in self.commands:
+            getattr(fg, name)(*args, **kwargs)
+
+
+def _recorder(name):
+    def record(self, *args, **kwargs):
+        self.commands.append((name, args, kwargs))
+    record.__name__ = name
+    record.__doc__ = f"Record a call to FunGraphics.{name}."
+    return record
+
+
+for _name in RECORDABLE:
+    setattr(CommandBuffer, _name, _recorder(_name))
+del _name
@@ -0,0 +1,76 @@
+"""
+Display lists for FunGraphics.
+
+A DisplayList holds the canvas items produced by drawing calls made between
+FunGraphics.beginDisplayList() and endDisplayList(). drawDisplayList() shows
+them again, moved and scaled, without running the drawing code again.
+"""
+
+# Transformed copies of the items kept per display list (by offset and scale)
+TRANSFORM_CACHE_SIZE = 8
+
+
+def _transform(kind, coords, options, dx, dy, scale):
+    """Coordinates and options of an item moved by (dx, dy) after scaling by scale."""
+    if scale == 1:
+        coords = tuple(c + dx if i % 2 == 0 else c + dy for i, c in enumerate(coords))
+        return coords, options
+    coords = tuple(c * scale + dx if i % 2 == 0 else c * scale + dy for i, c in enumerate(coords))
+    options = dict(options)
+    if "width" in options:
+        options["width"] = max(1, int(round(options["width"] * scale)))
+    if kind == "text":
+        name, size = options["font"]
+        options["font"] = (name, max(1, int(round(size * scale))))
+    return coords, options
+
+
+class DisplayList:
+    """
+    Recorded canvas items, see FunGraphics.beginDisplayList.
+    Images (pictures, fancy text) are moved but not scaled.
+    """
+    __slots__ = ("items", "_cache", "_images")
+
+    def __init__(self):
+        self.items = []   # (kind, coords, options) in drawing order
+        self._cache = {}  # (dx, dy, scale, form) -> transformed items
+        self._images = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def images(self):
+        """The images shown by the items."""
+        if self._images is None:
+            self._images = [options["image"] for kind, _, options in self.items if kind == "image"]
+        return self._images
+
+    def transformed(self, dx=0, dy=0, scale=1):
+        """The items moved by (dx, dy) after scaling by scale, as (kind, coords, options)."""
+        key = (dx, dy, scale, "items")
+        items = self._cache.get(key)
+        if items is None:
+            items = [(kind,) + _transform(kind, coords, options, dx, dy, scale)
+                     for kind, coords, options in self.items]
+            self._store(key, items)
+        return items
+
+    def tcl_items(self, item_types, dx=0, dy=0, scale=1):
+        """
+        The transformed items as Tcl lists {type coords options} for a bulk
+        canvas call; item_types maps item kinds to Tk item types.
+        """
+        key = (dx, dy, scale, "tcl")
+        items = self._cache.get(key)
+        if items is None:
+            items = tuple((item_types[kind], coords,
+                           tuple(v for name, value in options.items() for v in ("-" + name, value)))
+                          for kind, coords, options in self.transformed(dx, dy, scale))
+            self._store(key, items)
+        return items
+
+    def _store(self, key, items):
+        if len(self._cache) >= TRANSFORM_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = items
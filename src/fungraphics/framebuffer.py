@@ -0,0 +1,210 @@
+"""
+Pixel framebuffer for FunGraphics.
+
+The pixels live in a bytearray (packed RGB, row by row) and are shown as one
+canvas image, uploaded once per frame as PPM data, instead of one canvas item
+per pixel. Changed pixels are tracked per 32 x 32 tile so that only the dirty
+regions have to be uploaded.
+"""
+
+TILE_SHIFT = 5  # 32 x 32 pixel tiles
+
+
+def ppm_header(width, height, channels=3):
+    """Header of a binary PPM image (P6), or PGM (P5) for a single channel."""
+    return b"%s %d %d 255\n" % (b"P6" if channels == 3 else b"P5", width, height)
+
+
+def _or_tiles(a, b):
+    """Union of two tile masks (bytes of 0 or 1)."""
+    return (int.from_bytes(a, "big") | int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+
+class Framebuffer:
+    # Dirty tiles are merged into at most this many rectangles per upload
+    max_dirty_rects = 16
+    # Above this fraction of the image, the whole image is uploaded at once
+    full_upload_coverage = 0.5
+
+    def __init__(self, width, height, rgb=b"\xff\xff\xff"):
+        self.width = width
+        self.height = height
+        self.data = bytearray(rgb * (width * height))
+        self.tiles_x = (width + (1 << TILE_SHIFT) - 1) >> TILE_SHIFT
+        self.tiles_y = (height + (1 << TILE_SHIFT) - 1) >> TILE_SHIFT
+        self.dirty_tiles = bytearray(self.tiles_x * self.tiles_y)
+        self.full_dirty = True
+        self.dirty = True
+        # Color of the last fill and the tiles written since: a fill with the
+        # same color only changes those tiles back
+        self.fill_rgb = bytes(rgb)
+        self.written_tiles = bytearray(len(self.dirty_tiles))
+
+    def fill(self, rgb):
+        """Set every pixel to rgb (3 bytes)."""
+        self.data[:] = rgb * (self.width * self.height)
+        rgb = bytes(rgb)
+        if rgb == self.fill_rgb:
+            self.dirty_tiles[:] = _or_tiles(self.dirty_tiles, self.written_tiles)
+        else:
+            self.fill_rgb = rgb
+            self.full_dirty = True
+        self.written_tiles[:] = bytes(len(self.written_tiles))
+        self.dirty = True
+
+    def set_pixel(self, x, y, rgb):
+        x = int(x)
+        y = int(y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y * self.width + x) * 3
+            self.data[i:i + 3] = rgb
+            tile = (y >> TILE_SHIFT) * self.tiles_x + (x >> TILE_SHIFT)
+            self.dirty_tiles[tile] = 1
+            self.written_tiles[tile] = 1
+            self.dirty = True
+
+    def set_pixels(self, xs, ys, colors):
+        """
+        Set many pixels. colors is either 3 bytes used for every pixel, or one
+        (r, g, b) color per pixel. NumPy arrays are written without a Python loop.
+        """
+        # Arrays of colors go through NumPy too: bytes() of a row that is not
+        # uint8 would write more than 3 bytes per pixel
+        if hasattr(xs, "dtype") or hasattr(ys, "dtype") or hasattr(colors, "dtype"):
+            self._set_pixels_array(xs, ys, colors)
+            return
+        width, height, data = self.width, self.height, self.data
+        tiles, written, tiles_x = self.dirty_tiles, self.written_tiles, self.tiles_x
+        if isinstance(colors, bytes):
+            for x, y in zip(xs, ys):
+                x = int(x)
+                y = int(y)
+                if 0 <= x < width and 0 <= y < height:
+                    i = (y * width + x) * 3
+                    data[i:i + 3] = colors
+                    tile = (y >> TILE_SHIFT) * tiles_x + (x >> TILE_SHIFT)
+                    tiles[tile] = 1
+                    written[tile] = 1
+        else:
+            for x, y, color in zip(xs, ys, colors):
+                x = int(x)
+                y = int(y)
+                if 0 <= x < width and 0 <= y < height:
+                    i = (y * width + x) * 3
+                    data[i:i + 3] = bytes(color[:3])
+                    tile = (y >> TILE_SHIFT) * tiles_x + (x >> TILE_SHIFT)
+                    tiles[tile] = 1
+                    written[tile] = 1
+        self.dirty = True
+
+    def _set_pixels_array(self, xs, ys, colors):
+        import numpy as np
+        xs = np.asarray(xs).astype(np.intp, copy=False).ravel()
+        ys = np.asarray(ys).astype(np.intp, copy=False).ravel()
+        if isinstance(colors, bytes):
+            values = np.frombuffer(colors, dtype=np.uint8)
+        elif isinstance(colors, list) and colors and isinstance(colors[0], bytes):
+            # The 3 bytes of each pixel, as converted by FunGraphics.setPixels
+            values = np.frombuffer(b"".join(colors), dtype=np.uint8).reshape(-1, 3)
+        else:
+            values = np.asarray(colors)
+            if values.ndim == 2:
+                # One color per pixel: the extra pixels (or colors) are ignored
+                count = min(len(xs), len(ys), len(values))
+                xs, ys, values = xs[:count], ys[:count], values[:count, :3]
+            else:
+                values = values[:3]
+            values = values.astype(np.uint8, copy=False)
+        count = min(len(xs), len(ys))
+        xs, ys = xs[:count], ys[:count]
+        if count == 0:
+            return
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        pixels = np.frombuffer(self.data, dtype=np.uint8).reshape(-1, 3)
+        if values.ndim == 2:
+            values = values[inside]
+        xs, ys = xs[inside], ys[inside]
+        pixels[ys * self.width + xs] = values
+        touched = (ys >> TILE_SHIFT) * self.tiles_x + (xs >> TILE_SHIFT)
+        np.frombuffer(self.dirty_tiles, dtype=np.uint8)[touched] = 1
+        np.frombuffer(self.written_tiles, dtype=np.uint8)[touched] = 1
+        self.dirty = True
+
+    def dirty_rects(self):
+        """
+        Pixel rectangles (x0, y0, x1, y1) covering the changes since the last
+        mark_clean(), or None when the whole image should be uploaded.
+        """
+        if self.full_dirty:
+            return None
+        tiles, tiles_x = self.dirty_tiles, self.tiles_x
+        rects = []
+        open_runs = {}  # (tx0, tx1) -> first tile row of a rectangle still growing
+        for ty in range(self.tiles_y + 1):
+            runs = set()
+            if ty < self.tiles_y:
+                row = tiles[ty * tiles_x:(ty + 1) * tiles_x]
+                tx = row.find(1)
+                while tx != -1:
+                    end = row.find(0, tx)
+                    end = tiles_x if end == -1 else end
+                    runs.add((tx, end))
+                    tx = row.find(1, end)
+            # Runs matching the row above extend its rectangles, the others close them
+            for run in list(open_runs):
+                if run not in runs:
+                    rects.append((run[0], open_runs.pop(run), run[1], ty))
+            for run in runs:
+                open_runs.setdefault(run, ty)
+        if len(rects) > self.max_dirty_rects:
+            rects = self._merge_rects(rects)
+        shift = TILE_SHIFT
+        rects = [(x0 << shift, y0 << shift, min(x1 << shift, self.width), min(y1 << shift, self.height))
+                 for x0, y0, x1, y1 in rects]
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        if area > self.full_upload_coverage * self.width * self.height:
+            return None
+        return rects
+
+    def _merge_rects(self, rects):
+        """Merge rectangles until at most max_dirty_rects are left, adding the least area."""
+        if len(rects) > 4 * self.max_dirty_rects:
+            # Too scattered to be worth merging one by one: use the bounding box
+            return [(min(r[0] for r in rects), min(r[1] for r in rects),
+                     max(r[2] for r in rects), max(r[3] for r in rects))]
+        # Only rectangles next to each other in reading order are candidates
+        rects = sorted(rects, key=lambda r: (r[1], r[0]))
+        while len(rects) > self.max_dirty_rects:
+            best = None
+            for i in range(len(rects) - 1):
+                a, b = rects[i], rects[i + 1]
+                union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                growth = ((union[2] - union[0]) * (union[3] - union[1])
+                          - (a[2] - a[0]) * (a[3] - a[1]) - (b[2] - b[0]) * (b[3] - b[1]))
+                if best is None or growth < best[0]:
+                    best = (growth, i, union)
+            _, i, union = best
+            rects[i:i + 2] = [union]
+        return rects
+
+    def mark_clean(self):
+        self.dirty_tiles[:] = bytes(len(self.dirty_tiles))
+        self.full_dirty = False
+        self.dirty = False
+
+    def to_ppm(self):
+        """The whole buffer as binary PPM data."""
+        return ppm_header(self.width, self.height) + self.data
+
+    def region_ppm(self, x0, y0, x1, y1):
+        """Binary PPM data of the pixels in [x0, x1) x [y0, y1)."""
+        stride = self.width * 3
+        header = ppm_header(x1 - x0, y1 - y0)
+        if x0 == 0 and x1 == self.width:
+            return header + self.data[y0 * stride:y1 * stride]
+        return header + b"".join(self.data[y * stride + x0 * 3:y * stride + x1 * 3] for y in range(y0, y1))
+
+    def to_array(self):
+        """The buffer as an H x W x 3 uint8 NumPy array sharing its memory."""
+        import numpy as np
+        return np.frombuffer(self.data, dtype=np.uint8).reshape(self.height, self.width, 3)
@@ -1,6 +1,10 @@
-import tkinter as tk
+import numbers
 import time
-from .utils import GraphicsBitmap
+import weakref
+from collections import deque
+from .utils import GraphicsBitmap, LRUCache, anchor_offset, font_file, load_pil_font, optional_import
+from .framebuffer import Framebuffer, ppm_header
+from .picking import PickShape, SpatialIndex
 
 # Key constants
 K_s = 's'
@@ -22,13 +26,242 @@ MOUSE_BUTTON_LEFT = 1
 MOUSE_BUTTON_MIDDLE = 2
 MOUSE_BUTTON_RIGHT = 3
 
+# Named colors accepted wherever a color is expected (see registerColor)
+PALETTE = {
+    "black": "#000000",
+    "white": "#ffffff",
+    "red": "#ff0000",
+    "green": "#00ff00",
+    "blue": "#0000ff",
+    "yellow": "#ffff00",
+    "cyan": "#00ffff",
+    "magenta": "#ff00ff",
+    "orange": "#ffa500",
+    "gray": "#808080",
+    "light_gray": "#c0c0c0",
+    "dark_gray": "#404040",
+    "pink": "#ffafaf",
+}
+
+# Converted colors, so hot drawing loops do not format the same strings again
+_COLOR_CACHE_SIZE = 4096
+_hex_colors = {}
+_rgb_bytes = {}
+
+def _color_to_hex(color):
+    """
+    Convert a color to a Tk "#rrggbb" string.
+    Accepts (r, g, b) or (r, g, b, a) tuples (alpha is ignored), packed
+    0xRRGGBB integers (Python or NumPy), palette names and "#rgb" or "#rrggbb" strings.
+    Raises ValueError for unknown names.
+    """
+    try:
+        return _hex_colors[color]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable (list, array): use the equivalent tuple
+        color = tuple(color)
+        if color in _hex_colors:
+            return _hex_colors[color]
+    if isinstance(color, numbers.Integral):
+        # Also NumPy integers, e.g. a value of an array of packed colors
+        color = int(color)
+        hex_color = "#%06x" % (color & 0xFFFFFF)
+    elif isinstance(color, str):
+        hex_color = PALETTE.get(color.lower()) or _parse_hex_color(color)
+    elif len(color) >= 3:
+        hex_color = "#%02x%02x%02x" % (color[0], color[1], color[2])
+    else:
+        hex_color = "#000000"
+    if len(_hex_colors) >= _COLOR_CACHE_SIZE:
+        _hex_colors.clear()
+    _hex_colors[color] = hex_color
+    return hex_color
+
+def _parse_hex_color(color):
+    """The "#rrggbb" form of a "#rgb" or "#rrggbb" string; ValueError for anything else."""
+    digits = color[1:].lower()
+    if (not color.startswith("#") or len(digits) not in (3, 6)
+            or any(c not in "0123456789abcdef" for c in digits)):
+        raise ValueError(f"Unknown color: {color!r} (expected a PALETTE name, see registerColor, "
+                         f"\"#rgb\" or \"#rrggbb\")")
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return "#" + digits
+
+def _changed_options(old, options):
+    """The options of a recycled item that differ from the ones it was drawn with."""
+    if old.keys() != options.keys():
+        return options
+    # Images are compared by identity (NumPy images of the raster canvas have no ==)
+    return {name: value for name, value in options.items()
+            if (old[name] is not value if name == "image" else old[name] != value)}
+
+def _batch_values(values):
+    """A list of the values of a sequence or NumPy array (as Python numbers)."""
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return values if isinstance(values, list) else list(values)
+
+def _is_single_color(colors):
+    """
+    Whether the colors of a batch are one color for all the shapes: None, a
+    packed 0xRRGGBB integer, a string or an (r, g, b[, a]) tuple. A list or
+    array, or a tuple of colors, has one color per shape (tuples, strings or
+    packed integers).
+    """
+    if colors is None or isinstance(colors, (int, str)) or not hasattr(colors, "__len__"):
+        return True
+    return isinstance(colors, tuple) and bool(colors) and not hasattr(colors[0], "__len__")
+
+def _batch_columns(*columns):
+    """
+    Lists of the values of batch arguments, a single value being repeated for
+    each shape. Returns (number of shapes, lists).
+    """
+    columns = [value if not hasattr(value, "__len__") else _batch_values(value) for value in columns]
+    count = min((len(value) for value in columns if isinstance(value, list)), default=1)
+    return count, [value if isinstance(value, list) else [value] * count for value in columns]
+
+def _image_size(image):
+    """(width, height) of an image shown by the canvas: PhotoImage, PIL image, array or Framebuffer."""
+    if hasattr(image, "shape"):
+        return image.shape[1], image.shape[0]
+    width, height = image.width, image.height
+    return (width(), height()) if callable(width) else (width, height)
+
+def _hex_to_bytes(hex_color):
+    """The 3 RGB bytes of a "#rrggbb" string, as stored in the framebuffer."""
+    rgb = _rgb_bytes.get(hex_color)
+    if rgb is None:
+        if len(_rgb_bytes) >= _COLOR_CACHE_SIZE:
+            _rgb_bytes.clear()
+        rgb = _rgb_bytes[hex_color] = bytes.fromhex(hex_color[1:])
+    return rgb
+
+# Memory budget of the pre-rendered drawFancyString images
+TEXT_SPRITE_CACHE_BYTES = 16 * 1024 * 1024
+
+# Memory budget and rotation step of the drawTransformedPicture/drawMirroredPicture cache
+SPRITE_CACHE_BYTES = 64 * 1024 * 1024
+SPRITE_ANGLE_STEP = 1.0
+
+# Precise frame scheduler: the last part of the wait is spent spinning instead
+# of sleeping, as sleeps can overshoot by the OS timer granularity
+SCHEDULER_SPIN_TIME = 0.001
+# Late by more than this many frames, the catch-up policy gives up and resets
+SCHEDULER_MAX_CATCHUP = 5
+
+# Frames submitted by other threads waiting to be drawn at most (see submitFrame)
+SUBMITTED_FRAMES = 2
+
+# How often Tk events are processed while nextFrame waits, in seconds
+ASYNC_PUMP_INTERVAL = 0.005
+
+# pick() finds lines within this many pixels
+PICK_LINE_DISTANCE = 2
+
+# Number of frames the rolling statistics of getFrameStats are computed on
+FRAME_STATS_HISTORY = 240
+
+# Canvas item kinds used by the drawing methods. Items of the same kind are
+# configured with the same set of options, so one can be recycled as another.
+_ITEM_KINDS = {
+    "rect": "rectangle",
+    "fillrect": "rectangle",
+    "line": "line",
+    "oval": "oval",
+    "filloval": "oval",
+    "polygon": "polygon",
+    "fillpolygon": "polygon",
+    "text": "text",
+    "image": "image",
+}
+
+# Tcl procedure creating many canvas items in one call, used by the batch drawing methods
+_BATCH_PROC = """
+proc fungraphics_batch {canvas type coords common options} {
+    if {[llength $options] == 0} {
+        foreach c $coords {$canvas create $type {*}$c {*}$common -tags fg}
+    } else {
+        foreach c $coords o $options {$canvas create $type {*}$c {*}$common {*}$o -tags fg}
+    }
+}
+"""
+
+# Tcl procedure creating the items of a display list in one call
+_LIST_PROC = """
+proc fungraphics_list {canvas items} {
+    foreach item $items {
+        lassign $item type coords options
+        $canvas create $type {*}$coords {*}$options -tags fg
+    }
+}
+"""
+
+# Item options copied to the offscreen renderer by saveAsPNG, per item type
+_SNAPSHOT_OPTIONS = {
+    "rectangle": ("fill", "outline", "width"),
+    "oval": ("fill", "outline", "width"),
+    "line": ("fill", "width"),
+    "polygon": ("fill", "outline", "width"),
+    "text": ("fill", "text", "font", "anchor"),
+    "image": ("image", "anchor"),
+}
+
+class KeyEvent:
+    """Event passed to keyPressed and keyReleased: key is the Tk key name (see K_ constants)."""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+
+class MouseEvent:
+    """Event passed to mouseClicked and mouseMoved: position and button (0 for motion)."""
+    __slots__ = ("x", "y", "button")
+
+    def __init__(self, x, y, button=0):
+        self.x = x
+        self.y = y
+        self.button = button
+
+
 class FunGraphics:
-    def __init__(self, width, height, xoffset=-1, yoffset=-1, title="FunGraphics", high_quality=True):
+    # Backend of the windows created without a backend argument; set it to
+    # "numpy" to run unmodified programs headlessly (tests, benchmarks)
+    default_backend = "tk"
+
+    def __init__(self, width, height, xoffset=-1, yoffset=-1, title="FunGraphics", high_quality=True,
+                 retained=False, backend=None, framebuffer=False):
+        """
+        backend: "tk" opens a window, "numpy" draws headlessly into an
+        H x W x 4 uint8 array (see getArray), without needing a display.
+        Defaults to FunGraphics.default_backend.
+        """
         self.width = width
         self.height = height
         self.title = title
         
-        self.root = tk.Tk()
+        if backend is None:
+            backend = self.default_backend
+        # tkinter is imported by the first Tk window, so that importing the
+        # package and headless programs do not pay for it
+        if backend == "tk":
+            self._tkinter = optional_import("tkinter")
+            if self._tkinter is None:
+                raise ImportError("The tk backend requires tkinter (use backend=\"numpy\" without it)")
+            self._tcl_error = self._tkinter.TclError
+            self.root = self._tkinter.Tk()
+        elif backend == "numpy":
+            from .raster import RasterRoot, RasterCanvas
+            self._tkinter = None
+            self._tcl_error = ()
+            self.root = RasterRoot()
+        else:
+            raise ValueError(f"Unknown backend: {backend!r} (expected 'tk' or 'numpy')")
+        self.backend = backend
         self.root.title(title)
         
         # Set window position if specified
@@ -40,13 +273,53 @@ class FunGraphics:
         self.root.resizable(False, False)
         
         # Create dual layers for background and foreground
-        self.canvas = tk.Canvas(self.root, width=width, height=height, highlightthickness=0)
+        if backend == "tk":
+            self.canvas = self._tkinter.Canvas(self.root, width=width, height=height, highlightthickness=0)
+        else:
+            self.canvas = RasterCanvas(self.root, width=width, height=height, highlightthickness=0)
         self.canvas.pack()
+        self._creators = {kind: getattr(self.canvas, "create_" + item_type)
+                          for kind, item_type in _ITEM_KINDS.items()}
         
-        # Store layer state
+        # Layers: foreground items are tagged "fg" and deleted by clear(), background
+        # items are tagged "bg" and kept until clearBackground()
         self.current_layer = 'foreground'
-        self.background_items = []
-        self.foreground_items = []
+        self._background_commands = []  # (command key, item, options) of the background
+        self._background_cursor = 0     # commands of the background redrawn this frame
+        self._background_redrawn = False
+        
+        # Retained mode: clear() keeps the items of the previous frame so the
+        # next frame's draw calls can recycle them instead of creating new ones
+        self.retained = retained
+        self._frame_items = []      # (kind, item, coords, options) drawn since the last clear()
+        self._reusable_items = []   # (kind, item, coords, options) of the previous frame
+        self._reuse_cursor = 0
+        self._reuse_pool = None     # kind -> [entry], once the frame stopped matching
+        self._untracked_items = False
+        self._background_color = None
+        
+        # Framebuffer mode: pixels go into one image instead of one item each
+        self._framebuffer = None
+        self._fb_image = None
+        self._fb_item = None
+        self._fb_stats = {"dirty_area": 0, "dirty_rects": 0, "full_upload": False, "upload_time": 0.0}
+        
+        # Images reused by blitArray: the n-th blit of a frame updates the n-th image
+        self._blit_images = []
+        self._blit_count = 0
+        self._batch_proc_defined = False
+        
+        # Picking, see setPickId: foreground shapes of the frame in a grid, background
+        # shapes as (background command index, shape) with a grid rebuilt after changes
+        self._pick_id = None
+        self._pick_index = None
+        self._pick_order = 0
+        self._background_shapes = []
+        self._background_index = None
+        
+        # Display list being recorded, see beginDisplayList
+        self._display_list = None
+        self._list_proc_defined = False
         
         # Default settings
         self.color = "#000000" # Black
@@ -54,6 +327,47 @@ class FunGraphics:
         self.font_name = "Arial"
         self.font_size = 20
         
+        # Text measurement: Tk fonts by (name, size), sizes by (name, size, text)
+        self._fonts = {}
+        self._text_sizes = LRUCache(max_entries=4096)
+        self._text_sprites = LRUCache(max_bytes=TEXT_SPRITE_CACHE_BYTES, sizeof=lambda sprite: sprite[1])
+        
+        # Transformed bitmaps by (bitmap, transformation), see configureSpriteCache
+        self._sprites = LRUCache(max_bytes=SPRITE_CACHE_BYTES, sizeof=lambda sprite: sprite[1])
+        self._sprite_angle_step = SPRITE_ANGLE_STEP
+        
+        # Tk images shown on the canvas by name, so saveAsPNG can read their pixels
+        self._shown_images = weakref.WeakValueDictionary() if backend == "tk" else None
+        
+        # Images shown by the items of the current (and, in retained mode, the
+        # previous) frame; cached images must stay alive while they are displayed
+        self._frame_images = []
+        self._previous_frame_images = []
+        
+        # Frame pacing, see setFrameScheduler
+        self._scheduler = None
+        self._next_deadline = None
+        self._scheduled_fps = None
+        self._frames_skipped = 0
+        self._last_sync = time.perf_counter()
+        
+        # Per-frame statistics, see getFrameStats
+        self._counts = dict.fromkeys(("items_created", "items_reused", "items_deleted",
+                                      "tk_calls", "images_converted"), 0)
+        self._fg_item_count = 0  # foreground items on the canvas, deleted by clear()
+        self._frame_stats = None
+        self._frame_times = deque(maxlen=FRAME_STATS_HISTORY)
+        self._frame_number = 0
+        self._show_stats = False
+        
+        # Frames recorded by other threads, see submitFrame (queue imports
+        # threading, which programs that do not use threads need not load)
+        import queue
+        self._submitted_frames = queue.Queue(maxsize=SUBMITTED_FRAMES)
+        
+        # Frame recorder, see startRecording
+        self._recorder = None
+        
         # Window state
         self.window_closed = False
         self.root.protocol("WM_DELETE_WINDOW", self._on_window_close)
@@ -62,33 +376,284 @@ class FunGraphics:
         self.key_listeners = []
         self.mouse_listeners = []
         self.mouse_motion_listeners = []
+        # Listener methods by event, see _add_handlers
+        self._handlers = {"keyPressed": [], "keyReleased": [], "mouseClicked": [], "mouseMoved": []}
+        self._coalesce_motion = False
+        self._pending_motion = None
+        # Input state for polling, updated from the queued events at each syncGameLogic
+        self._input_queue = []      # (time, event, key or button) received since the last frame
+        self._input_events = []     # the same, for the last frame
+        self._keys_down = set()
+        self._keys_pressed = set()
+        self._keys_released = set()
+        self._buttons_down = set()
+        self._mouse_position = (0, 0)
         
         self.root.bind("<KeyPress>", self._on_key_press)
         self.root.bind("<KeyRelease>", self._on_key_release)
         self.canvas.bind("<Button>", self._on_mouse_click)
         self.canvas.bind("<Motion>", self._on_mouse_motion)
+        self.canvas.bind("<ButtonRelease>", self._on_mouse_release)
         
         # Clear screen initially
         self.clear((255, 255, 255)) # White
+        if framebuffer:
+            self.setFramebufferMode(True)
         
         self.last_time = time.time()
         
-    def _rgb_to_hex(self, color):
-        # Handle 3 or 4 tuple (ignore alpha for hex)
-        if len(color) >= 3:
-            return "#%02x%02x%02x" % (color[0], color[1], color[2])
-        return "#000000"
+    _rgb_to_hex = staticmethod(_color_to_hex)
+
+    def registerColor(self, name, color):
+        """Add a named color to the palette, usable wherever a color is expected."""
+        PALETTE[name.lower()] = _color_to_hex(color)
+        # Drop conversions of the name made before it was (re)defined
+        _hex_colors.pop(name, None)
+        _hex_colors.pop(name.lower(), None)
         
     def clear(self, color=(255, 255, 255)):
+        """
+        Clear the foreground with the given color.
+        The background layer (see drawBackground) is kept.
+        """
         if self.window_closed:
             return
-        self.canvas.delete("all")
-        self.canvas.configure(bg=self._rgb_to_hex(color))
+        self._end_background_frame()
+        if self.retained and not self._untracked_items:
+            self._delete_unused_items()
+            self._reusable_items = self._frame_items
+            self._frame_items = []
+            self._previous_frame_images = self._frame_images
+        else:
+            self.canvas.delete("fg")
+            self._counts["items_deleted"] += self._fg_item_count
+            self._counts["tk_calls"] += 1
+            self._fg_item_count = 0
+            self._untracked_items = False
+        self._frame_images = []
+        if self._pick_index is not None:
+            self._pick_index.clear()
+        bg = self._rgb_to_hex(color)
+        if bg != self._background_color:
+            self.canvas.configure(bg=bg)
+            self._background_color = bg
+        if self._framebuffer is not None:
+            self._framebuffer.fill(_hex_to_bytes(bg))
+            self._show_framebuffer()
+        self._blit_count = 0
+
+    def setFramebufferMode(self, enabled):
+        """
+        Enable or disable framebuffer mode.
+        In framebuffer mode setPixel/setPixels write into a single image covering
+        the window, uploaded once per frame in syncGameLogic, instead of creating
+        one canvas item per pixel. The image is below every other shape.
+        """
+        if bool(enabled) == (self._framebuffer is not None):
+            return
+        if not enabled:
+            if self._fb_item is not None:
+                self.canvas.delete(self._fb_item)
+            self._framebuffer = self._fb_image = self._fb_item = None
+            return
+        bg = self._background_color or "#ffffff"
+        self._framebuffer = Framebuffer(self.width, self.height, _hex_to_bytes(bg))
+        if self.backend == "tk":
+            self._fb_image = self._tkinter.PhotoImage(master=self.root, width=self.width, height=self.height)
+        else:
+            self._fb_image = self._framebuffer
+        self._show_framebuffer()
+
+    def _show_framebuffer(self):
+        """Make sure the framebuffer image item exists, below everything else."""
+        if self._fb_item is None:
+            self._fb_item = self.canvas.create_image(0, 0, image=self._fb_image, anchor="nw", tags="fb")
+            self.canvas.tag_lower(self._fb_item)
+
+    def _upload_framebuffer(self):
+        """Send the changed framebuffer regions to the canvas."""
+        fb = self._framebuffer
+        if not fb.dirty:
+            self._fb_stats = {"dirty_area": 0, "dirty_rects": 0, "full_upload": False, "upload_time": 0.0}
+            return
+        start = time.perf_counter()
+        rects = fb.dirty_rects()
+        self._counts["images_converted"] += 1
+        self._counts["tk_calls"] += 1 if rects is None else len(rects)
+        if self.backend == "tk":
+            if rects is None:
+                self.root.tk.call(self._fb_image.name, "put", fb.to_ppm(), "-format", "ppm")
+            else:
+                for x0, y0, x1, y1 in rects:
+                    self.root.tk.call(self._fb_image.name, "put", fb.region_ppm(x0, y0, x1, y1),
+                                      "-format", "ppm", "-to", x0, y0)
+        else:
+            # The raster canvas reads the buffer directly, it only has to repaint
+            self.canvas.itemconfigure(self._fb_item, image=fb)
+        fb.mark_clean()
+        if rects is None:
+            area, count = fb.width * fb.height, 1
+        else:
+            area, count = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects), len(rects)
+        self._fb_stats = {"dirty_area": area, "dirty_rects": count, "full_upload": rects is None,
+                          "upload_time": time.perf_counter() - start}
+
+    def getFramebufferStats(self):
+        """
+        Statistics of the last framebuffer upload, as a dictionary:
+        dirty_area (pixels uploaded), dirty_rects (number of regions),
+        full_upload (True if the whole image was sent) and upload_time (seconds).
+        """
+        return dict(self._fb_stats)
+
+    def setRetainedMode(self, enabled):
+        """
+        Enable or disable retained mode.
+        In retained mode clear() does not delete the canvas items: the draw calls
+        of the next frame recycle them, and the ones left unused are deleted
+        when the frame ends (in syncGameLogic or at the next clear).
+        """
+        enabled = bool(enabled)
+        if enabled == self.retained:
+            return
+        if self.retained:
+            self._delete_unused_items()
+            self._frame_items = []
+        # Items already on the canvas are not tracked, the next clear() removes them
+        self._untracked_items = enabled
+        self.retained = enabled
+
+    def _draw_item(self, kind, coords, **options):
+        """Create a canvas item, or recycle one of the previous frame in retained mode."""
+        if self._display_list is not None:
+            self._display_list.items.append((kind, tuple(coords), options))
+            return None
+        if kind == "image" and self._shown_images is not None:
+            self._shown_images[str(options["image"])] = options["image"]
+        if self.current_layer == 'background':
+            return self._draw_background_item(kind, coords, options)
+        if self._pick_id is not None:
+            self._pick_index.add(self._pick_shape(kind, coords, options))
+        counts = self._counts
+        if not self.retained:
+            counts["items_created"] += 1
+            counts["tk_calls"] += 1
+            self._fg_item_count += 1
+            return self._creators[kind](*coords, tags="fg", **options)
+        coords = tuple(coords)
+        entry = self._reuse_item(kind)
+        if entry is None:
+            counts["items_created"] += 1
+            counts["tk_calls"] += 1
+            self._fg_item_count += 1
+            item = self._creators[kind](*coords, tags="fg", **options)
+        else:
+            counts["items_reused"] += 1
+            _, item, old_coords, old_options = entry
+            # Only send what changed: a static item costs no Tk call at all
+            if coords != old_coords:
+                counts["tk_calls"] += 1
+                self.canvas.coords(item, *coords)
+            changed = _changed_options(old_options, options)
+            if changed:
+                counts["tk_calls"] += 1
+                self.canvas.itemconfigure(item, **changed)
+        self._frame_items.append((kind, item, coords, options))
+        return item
+
+    def _draw_background_item(self, kind, coords, options):
+        """
+        Draw on the background layer. Draw calls identical to the ones of the
+        background already on the canvas keep its items instead of creating new ones.
+        """
+        coords = tuple(coords)
+        # Images are compared by identity (the recorded options keep them alive)
+        key = (kind, coords, tuple((name, id(value) if name == "image" else value)
+                                   for name, value in options.items()), self._pick_id)
+        commands = self._background_commands
+        i = self._background_cursor
+        self._background_cursor = i + 1
+        if i < len(commands):
+            if commands[i][0] == key:
+                return commands[i][1]
+            # The background changed from here on
+            self._delete_background_items(i)
+        item = self._creators[kind](*coords, tags="bg", **options)
+        self._counts["items_created"] += 1
+        self._counts["tk_calls"] += 2
+        if self._fg_item_count:
+            self._counts["tk_calls"] += 1
+            self.canvas.tag_lower(item, "fg")
+        if self._pick_id is not None:
+            self._background_shapes.append((len(commands), self._pick_shape(kind, coords, options)))
+            self._background_index = None
+        commands.append((key, item, options))
+        return item
+
+    def _end_background_frame(self):
+        """Delete the background items that were not drawn again, if the background was redrawn."""
+        if self._background_redrawn and self._background_cursor < len(self._background_commands):
+            self._delete_background_items(self._background_cursor)
+        self._background_cursor = 0
+        self._background_redrawn = False
+        self.current_layer = 'foreground'
+
+    def _delete_background_items(self, start):
+        """Delete the background items from the start-th one on."""
+        commands = self._background_commands
+        self.canvas.delete(*[item for _, item, _ in commands[start:]])
+        self._counts["items_deleted"] += len(commands) - start
+        self._counts["tk_calls"] += 1
+        del commands[start:]
+        if self._background_shapes and self._background_shapes[-1][0] >= start:
+            self._background_shapes = [entry for entry in self._background_shapes if entry[0] < start]
+            self._background_index = None
+
+    def _reuse_item(self, kind):
+        """
+        Return the entry (kind, item, coords, options) of an item of the previous
+        frame that can be recycled as `kind`, or None.
+        """
+        if self._reuse_pool is None:
+            i = self._reuse_cursor
+            if i < len(self._reusable_items) and self._reusable_items[i][0] == kind:
+                # Same drawing order as the previous frame: the stacking order is already right
+                self._reuse_cursor = i + 1
+                return self._reusable_items[i]
+            # The frame diverged from the previous one: group the remaining items by kind
+            self._reuse_pool = {}
+            for entry in self._reusable_items[i:]:
+                self._reuse_pool.setdefault(entry[0], []).append(entry)
+        entries = self._reuse_pool.get(kind)
+        if not entries:
+            return None
+        entry = entries.pop()
+        # Recycled out of order, move it on top like a newly created item
+        self.canvas.tag_raise(entry[1])
+        self._counts["tk_calls"] += 1
+        return entry
+
+    def _delete_unused_items(self):
+        """Delete the items of the previous frame that were not recycled."""
+        if self._reuse_pool is None:
+            leftovers = [entry[1] for entry in self._reusable_items[self._reuse_cursor:]]
+        else:
+            leftovers = [entry[1] for entries in self._reuse_pool.values() for entry in entries]
+        if leftovers:
+            self.canvas.delete(*leftovers)
+            self._counts["items_deleted"] += len(leftovers)
+            self._counts["tk_calls"] += 1
+            self._fg_item_count -= len(leftovers)
+        self._reusable_items = []
+        self._reuse_cursor = 0
+        self._reuse_pool = None
+        self._previous_frame_images = []
         
     def setColor(self, color):
         """
         Set the current drawing color.
-        Color can be a tuple (r, g, b) or (r, g, b, a).
+        Color can be a tuple (r, g, b) or (r, g, b, a), a packed integer
+        such as 0xFF8800, a palette name such as "red", or "#rrggbb".
         """
         self.color = self._rgb_to_hex(color)
         
@@ -96,8 +661,86 @@ class FunGraphics:
         if self.window_closed:
             return
         c = self.color if color is None else self._rgb_to_hex(color)
+        if self._framebuffer is not None:
+            self._framebuffer.set_pixel(x, y, _hex_to_bytes(c))
+            return
         # Draw a 1x1 rectangle (line might be invisible if length 0)
-        self.canvas.create_rectangle(x, y, x+1, y+1, fill=c, outline="")
+        self._draw_item("fillrect", (x, y, x+1, y+1), fill=c, outline="")
+
+    def setPixels(self, xs, ys, colors=None):
+        """
+        Set many pixels at once.
+        xs, ys: sequences (or NumPy arrays) of coordinates
+        colors: None for the current color, a single color, or one color per pixel
+        (a list of colors or an N x 3 array).
+        Fastest in framebuffer mode, where no canvas item is created.
+        """
+        if self.window_closed or len(xs) == 0:
+            return
+        if self._framebuffer is not None:
+            if _is_single_color(colors):
+                c = self.color if colors is None else self._rgb_to_hex(colors)
+                colors = _hex_to_bytes(c)
+            elif getattr(colors, "ndim", 1) != 2:
+                colors = [_hex_to_bytes(_color_to_hex(color)) for color in _batch_values(colors)]
+            self._framebuffer.set_pixels(xs, ys, colors)
+            return
+        self.drawPoints(xs, ys, colors)
+
+    def blitArray(self, array, x=0, y=0, scale=1):
+        """
+        Draw a NumPy array as an image with its top-left corner at (x, y).
+        array: H x W (gray), H x W x 3 (RGB) or H x W x 4 (RGBA, alpha is ignored),
+        uint8 values or floats between 0 and 1
+        scale: integer zoom factor
+        Returns the time spent converting and uploading the pixels, in seconds.
+        """
+        if self.window_closed:
+            return 0.0
+        import numpy as np
+        start = time.perf_counter()
+        pixels = np.asarray(array)
+        if pixels.ndim == 3 and pixels.shape[2] == 4:
+            pixels = pixels[:, :, :3]
+        if pixels.dtype != np.uint8:
+            if pixels.dtype.kind == "f":
+                pixels = np.clip(pixels, 0.0, 1.0) * 255 + 0.5
+            pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+        # No copy when the array already is contiguous uint8
+        pixels = np.ascontiguousarray(pixels)
+        height, width = pixels.shape[:2]
+        scale = max(1, int(scale))
+
+        if self.current_layer == 'background' or self._display_list is not None:
+            # The image stays shown (or recorded): it gets one that later blits do not reuse
+            slots, slot = [None], 0
+        else:
+            slots, slot = self._blit_images, self._blit_count
+            self._blit_count += 1
+            if slot == len(slots):
+                slots.append(None)
+        if self.backend == "tk":
+            images = slots[slot]
+            if images is None or images[0] != (pixels.shape, scale):
+                PhotoImage = self._tkinter.PhotoImage
+                source = PhotoImage(master=self.root, width=width, height=height)
+                shown = source if scale == 1 else PhotoImage(master=self.root, width=width * scale,
+                                                             height=height * scale)
+                images = slots[slot] = ((pixels.shape, scale), source, shown)
+            _, source, shown = images
+            self._counts["tk_calls"] += 1 if shown is source else 2
+            channels = 1 if pixels.ndim == 2 else 3
+            self.root.tk.call(source.name, "put", ppm_header(width, height, channels) + pixels.data,
+                              "-format", "ppm")
+            if shown is not source:
+                self.root.tk.call(shown.name, "copy", source.name, "-zoom", scale, scale)
+        else:
+            # The raster canvas keeps its own copy, like a PhotoImage would
+            shown = pixels.repeat(scale, 0).repeat(scale, 1) if scale != 1 else pixels.copy()
+            slots[slot] = shown
+        self._counts["images_converted"] += 1
+        self._draw_item("image", (x, y), image=shown, anchor="nw")
+        return time.perf_counter() - start
         
     def setPenWidth(self, width):
         self.line_width = int(width)
@@ -105,47 +748,293 @@ class FunGraphics:
     def drawLine(self, x1, y1, x2, y2):
         if self.window_closed:
             return
-        self.canvas.create_line(x1, y1, x2, y2, fill=self.color, width=self.line_width)
+        self._draw_item("line", (x1, y1, x2, y2), fill=self.color, width=self.line_width)
         
     def drawRect(self, x, y, width, height):
         if self.window_closed:
             return
-        self.canvas.create_rectangle(x, y, x+width, y+height, outline=self.color, width=self.line_width)
+        self._draw_item("rect", (x, y, x+width, y+height), outline=self.color, width=self.line_width)
         
     def drawFillRect(self, x, y, width, height):
         if self.window_closed:
             return
-        self.canvas.create_rectangle(x, y, x+width, y+height, fill=self.color, outline="")
+        self._draw_item("fillrect", (x, y, x+width, y+height), fill=self.color, outline="")
         
     def drawCircle(self, x, y, diameter):
         if self.window_closed:
             return
-        self.canvas.create_oval(x, y, x+diameter, y+diameter, outline=self.color, width=self.line_width)
+        self._draw_item("oval", (x, y, x+diameter, y+diameter), outline=self.color, width=self.line_width)
         
     def drawFilledCircle(self, x, y, diameter):
         if self.window_closed:
             return
-        self.canvas.create_oval(x, y, x+diameter, y+diameter, fill=self.color, outline="")
+        self._draw_item("filloval", (x, y, x+diameter, y+diameter), fill=self.color, outline="")
         
+    # Batch drawing: one call for many shapes. Coordinates, sizes and colors are
+    # sequences or NumPy arrays; a single value is used for every shape.
+
+    def drawPolyline(self, xs, ys, color=None):
+        """Draw connected line segments through the points (xs[i], ys[i]), as one shape."""
+        if self.window_closed:
+            return
+        xs, ys = _batch_values(xs), _batch_values(ys)
+        if len(xs) < 2:
+            return
+        points = [v for point in zip(xs, ys) for v in point]
+        c = self.color if color is None else self._rgb_to_hex(color)
+        self._draw_item("line", points, fill=c, width=self.line_width)
+
+    def drawLines(self, x1, y1, x2, y2, colors=None, widths=None):
+        """Draw the separate segments from (x1[i], y1[i]) to (x2[i], y2[i])."""
+        if self.window_closed:
+            return
+        count, (x1, y1, x2, y2) = _batch_columns(x1, y1, x2, y2)
+        coords = list(zip(x1, y1, x2, y2))
+        common, per_item = self._batch_colors("fill", colors, count)
+        if widths is None or not hasattr(widths, "__len__"):
+            common["width"] = self.line_width if widths is None else widths
+        else:
+            widths = _batch_values(widths)
+            per_item = [dict(options, width=w)
+                        for options, w in zip([{}] * count if per_item is None else per_item, widths)]
+        self._draw_batch("line", coords, common, per_item)
+
+    def drawRects(self, xs, ys, widths, heights, colors=None, filled=True):
+        """Draw rectangles with their top-left corners at (xs[i], ys[i]), filled or outlined."""
+        if self.window_closed:
+            return
+        count, (xs, ys, widths, heights) = _batch_columns(xs, ys, widths, heights)
+        coords = [(x, y, x + w, y + h) for x, y, w, h in zip(xs, ys, widths, heights)]
+        if filled:
+            common, per_item = self._batch_colors("fill", colors, count)
+            common["outline"] = ""
+            self._draw_batch("fillrect", coords, common, per_item)
+        else:
+            common, per_item = self._batch_colors("outline", colors, count)
+            common["width"] = self.line_width
+            self._draw_batch("rect", coords, common, per_item)
+
+    def drawCircles(self, xs, ys, diameters, colors=None, filled=True):
+        """Draw circles in the squares with top-left corners (xs[i], ys[i]), filled or outlined."""
+        if self.window_closed:
+            return
+        count, (xs, ys, diameters) = _batch_columns(xs, ys, diameters)
+        coords = [(x, y, x + d, y + d) for x, y, d in zip(xs, ys, diameters)]
+        if filled:
+            common, per_item = self._batch_colors("fill", colors, count)
+            common["outline"] = ""
+            self._draw_batch("filloval", coords, common, per_item)
+        else:
+            common, per_item = self._batch_colors("outline", colors, count)
+            common["width"] = self.line_width
+            self._draw_batch("oval", coords, common, per_item)
+
+    def drawPoints(self, xs, ys, colors=None, size=1):
+        """Draw size x size squares with their top-left corners at (xs[i], ys[i])."""
+        if self.window_closed:
+            return
+        if size == 1 and self._framebuffer is not None:
+            self.setPixels(xs, ys, colors)
+            return
+        self.drawRects(xs, ys, size, size, colors)
+
+    def _batch_colors(self, option, colors, count):
+        """
+        Options for the colors of a batch: (options shared by every shape,
+        list of options per shape or None).
+        """
+        if _is_single_color(colors):
+            return {option: self.color if colors is None else self._rgb_to_hex(colors)}, None
+        colors = _batch_values(colors)
+        return {}, [{option: _color_to_hex(tuple(c) if isinstance(c, list) else c)} for c in colors[:count]]
+
+    def _draw_batch(self, kind, coords, common, per_item=None):
+        """Draw one shape per coordinates tuple, with one Tk call when possible."""
+        if per_item is not None:
+            coords = coords[:len(per_item)]
+        if (self.backend == "tk" and not self.retained and self.current_layer != 'background'
+                and self._display_list is None and self._pick_id is None and len(coords) > 1):
+            if not self._batch_proc_defined:
+                self.root.tk.eval(_BATCH_PROC)
+                self._batch_proc_defined = True
+            common = [v for name, value in common.items() for v in ("-" + name, value)]
+            per_item = [[v for name, value in options.items() for v in ("-" + name, value)]
+                        for options in per_item] if per_item else []
+            self.root.tk.call("fungraphics_batch", str(self.canvas), _ITEM_KINDS[kind], coords, common, per_item)
+            self._counts["items_created"] += len(coords)
+            self._counts["tk_calls"] += 1
+            self._fg_item_count += len(coords)
+            return
+        if per_item is None:
+            for c in coords:
+                self._draw_item(kind, c, **common)
+        else:
+            for c, options in zip(coords, per_item):
+                self._draw_item(kind, c, **common, **options)
+
+    # Picking
+
+    def setPickId(self, pick_id):
+        """
+        Give the shapes drawn from now on a pick id (any value, e.g. a cell of a
+        board), so that pick() and pickRect() can find them. None stops it.
+        Foreground shapes are forgotten by clear(), background shapes stay with
+        the background. Closed shapes are hit anywhere inside, lines within
+        PICK_LINE_DISTANCE pixels.
+        """
+        if pick_id is not None and self._pick_index is None:
+            self._pick_index = SpatialIndex(self.width, self.height)
+        self._pick_id = pick_id
+
+    def pick(self, x, y):
+        """The pick ids of the shapes at (x, y), the topmost first (each id once)."""
+        ids = {}
+        for index in self._pick_indexes():
+            for shape in index.at_point(x, y):
+                ids.setdefault(shape.pick_id)
+        return list(ids)
+
+    def pickRect(self, x, y, width, height):
+        """The pick ids of the shapes whose bounding boxes overlap the rectangle, the topmost first."""
+        ids = {}
+        for index in self._pick_indexes():
+            for shape in index.in_rect(x, y, x + width, y + height):
+                ids.setdefault(shape.pick_id)
+        return list(ids)
+
+    def _pick_indexes(self):
+        """Indexes of the pickable shapes, foreground first."""
+        indexes = [self._pick_index] if self._pick_index is not None else []
+        if self._background_shapes:
+            if self._background_index is None:
+                self._background_index = SpatialIndex(self.width, self.height)
+                for _, shape in self._background_shapes:
+                    self._background_index.add(shape)
+            indexes.append(self._background_index)
+        return indexes
+
+    def _pick_shape(self, kind, coords, options):
+        """The PickShape of an item being drawn with the current pick id."""
+        coords = tuple(coords)
+        self._pick_order += 1
+        if kind == "text" or kind == "image":
+            if kind == "text":
+                width, height = self.getStringSize(options["text"], options["font"][1])
+            else:
+                width, height = _image_size(options["image"])
+            dx, dy = anchor_offset(options.get("anchor", "center"), width, height)
+            x, y = coords[0] + dx, coords[1] + dy
+            return PickShape(self._pick_id, self._pick_order, kind, coords, 0, (x, y, x + width, y + height))
+        if kind == "line":
+            half = max(options.get("width", 1) / 2, PICK_LINE_DISTANCE)
+        else:
+            half = options.get("width", 1) / 2 if options.get("outline") else 0
+        xs, ys = coords[0::2], coords[1::2]
+        bbox = (min(xs) - half, min(ys) - half, max(xs) + half, max(ys) + half)
+        return PickShape(self._pick_id, self._pick_order, kind, coords, half, bbox)
+
+    # Display lists
+
+    def beginDisplayList(self):
+        """
+        Start recording a display list: the following drawing calls are not
+        shown but recorded, until endDisplayList() returns them. Draw the list
+        with drawDisplayList(), as many times as needed, without running the
+        drawing code again. (setPixel in framebuffer mode is not recorded.)
+        """
+        if self._display_list is not None:
+            raise RuntimeError("beginDisplayList() called while already recording a display list")
+        from .display_list import DisplayList
+        self._display_list = DisplayList()
+
+    def endDisplayList(self):
+        """Stop recording and return the DisplayList."""
+        if self._display_list is None:
+            raise RuntimeError("endDisplayList() called without beginDisplayList()")
+        display_list, self._display_list = self._display_list, None
+        return display_list
+
+    def drawDisplayList(self, display_list, x=0, y=0, scale=1):
+        """
+        Draw a recorded display list moved by (x, y), after scaling it by scale
+        around the origin (pictures are moved, not scaled). The list is drawn
+        in the current layer; with Tk all its shapes are created in one call.
+        """
+        if self.window_closed or not display_list.items:
+            return
+        if (self.backend == "tk" and not self.retained and self.current_layer != 'background'
+                and self._display_list is None and self._pick_id is None):
+            if not self._list_proc_defined:
+                self.root.tk.eval(_LIST_PROC)
+                self._list_proc_defined = True
+            items = display_list.tcl_items(_ITEM_KINDS, x, y, scale)
+            for image in display_list.images():
+                self._shown_images[str(image)] = image
+            self.root.tk.call("fungraphics_list", str(self.canvas), items)
+            self._counts["items_created"] += len(items)
+            self._counts["tk_calls"] += 1
+            self._fg_item_count += len(items)
+            return
+        for kind, coords, options in display_list.transformed(x, y, scale):
+            self._draw_item(kind, coords, **options)
+
     def drawString(self, x, y, text, font_size=20, color=None):
         if self.window_closed:
             return
         c = self.color if color is None else self._rgb_to_hex(color)
         font = (self.font_name, font_size)
-        self.canvas.create_text(x, y, text=text, fill=c, font=font, anchor="nw")
+        self._draw_item("text", (x, y), text=text, fill=c, font=font, anchor="nw")
         
     def drawPicture(self, x, y, bitmap):
         if self.window_closed:
             return
         # Centered drawing
-        if bitmap.image:
-            self.canvas.create_image(x, y, image=bitmap.image, anchor="c")
+        image = self._bitmap_image(bitmap)
+        if image is not None:
+            self._draw_item("image", (x, y), image=image, anchor="c")
+
+    def _bitmap_image(self, bitmap):
+        """The image of a bitmap the canvas can draw: a PhotoImage, or the PIL image headless."""
+        if self.backend == "tk":
+            return bitmap.image if bitmap.image else None
+        return bitmap.pil_image
+
+    def _cache_sprite(self, key, pil_image):
+        """Convert a transformed PIL image for the canvas and cache it as (image, size in bytes)."""
+        if self.backend == "tk":
+            image = optional_import("PIL.ImageTk").PhotoImage(pil_image)
+        else:
+            image = pil_image
+        self._counts["images_converted"] += 1
+        sprite = (image, pil_image.width * pil_image.height * 4)
+        self._sprites.put(key, sprite)
+        return sprite
+
+    def configureSpriteCache(self, angle_step=None, max_bytes=None):
+        """
+        Tune the cache of drawTransformedPicture/drawMirroredPicture images.
+        angle_step: rotations are rounded to multiples of this many degrees
+        (0 disables rounding); max_bytes: memory budget of the cached images.
+        """
+        if angle_step is not None:
+            self._sprite_angle_step = angle_step
+        if max_bytes is not None:
+            self._sprites.set_limits(max_bytes=max_bytes)
+
+    def getArray(self):
+        """
+        Return the current frame as an H x W x 4 uint8 RGBA array (read-only).
+        Only available with backend="numpy".
+        """
+        if self.backend != "numpy":
+            raise RuntimeError("getArray() requires FunGraphics(..., backend=\"numpy\")")
+        return self.canvas.render()
     
     def drawFilledOval(self, x, y, width, height):
         """Draw a filled oval (ellipse)."""
         if self.window_closed:
             return
-        self.canvas.create_oval(x, y, x+width, y+height, fill=self.color, outline="")
+        self._draw_item("filloval", (x, y, x+width, y+height), fill=self.color, outline="")
     
     def drawPolygon(self, points):
         """Draw a polygon outline from a list of (x, y) tuples."""
@@ -154,7 +1043,7 @@ class FunGraphics:
         if len(points) < 3:
             return
         flat_points = [coord for point in points for coord in point]
-        self.canvas.create_polygon(flat_points, outline=self.color, fill="", width=self.line_width)
+        self._draw_item("polygon", flat_points, outline=self.color, fill="", width=self.line_width)
     
     def drawFilledPolygon(self, points, color=None):
         """Draw a filled polygon from a list of (x, y) tuples."""
@@ -164,7 +1053,7 @@ class FunGraphics:
             return
         c = self.color if color is None else self._rgb_to_hex(color)
         flat_points = [coord for point in points for coord in point]
-        self.canvas.create_polygon(flat_points, fill=c, outline=c)
+        self._draw_item("fillpolygon", flat_points, fill=c, outline=c)
     
     def getStringSize(self, text, font_size=None):
         """
@@ -175,16 +1064,59 @@ class FunGraphics:
             return (0, 0)
         if font_size is None:
             font_size = self.font_size
-        font = (self.font_name, font_size)
-        # Create a temporary text item to measure
-        temp_id = self.canvas.create_text(0, 0, text=text, font=font, anchor="nw")
-        bbox = self.canvas.bbox(temp_id)
-        self.canvas.delete(temp_id)
-        if bbox:
-            width = bbox[2] - bbox[0]
-            height = bbox[3] - bbox[1]
+        key = (self.font_name, font_size, text)
+        size = self._text_sizes.get(key)
+        if size is None:
+            size = self._measure_text(text, font_size)
+            self._text_sizes.put(key, size)
+        return size
+
+    def measureStrings(self, texts, font_size=None):
+        """
+        Get the dimensions of several strings at once.
+        Returns a list of (width, height) tuples, in the same order as texts.
+        """
+        if self.window_closed:
+            return [(0, 0)] * len(texts)
+        if font_size is None:
+            font_size = self.font_size
+        sizes = [self._text_sizes.get((self.font_name, font_size, text)) for text in texts]
+        missing = [text for text, size in zip(texts, sizes) if size is None]
+        if missing and self.backend == "tk":
+            # Measure every missing line in a single Tcl call
+            font = self._tk_font(font_size)
+            lines = [line for text in missing for line in str(text).split("\n")]
+            widths = self.root.tk.call("apply", "{font lines} {lmap line $lines {font measure $font $line}}",
+                                       font.name, lines)
+            widths = iter(self.root.tk.splitlist(widths))
+            line_height = font.metrics("linespace")
+            for text in missing:
+                text_lines = str(text).split("\n")
+                width = max(int(next(widths)) for _ in text_lines)
+                self._text_sizes.put((self.font_name, font_size, text), (width, line_height * len(text_lines)))
+        elif missing:
+            for text in missing:
+                self._text_sizes.put((self.font_name, font_size, text), self._measure_text(text, font_size))
+        return [size if size is not None else self._text_sizes.get((self.font_name, font_size, text))
+                for text, size in zip(texts, sizes)]
+
+    def _tk_font(self, font_size):
+        """The cached tkinter Font for the current font name and a size."""
+        key = (self.font_name, font_size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = optional_import("tkinter.font").Font(root=self.root, family=self.font_name, size=font_size)
+        return font
+
+    def _measure_text(self, text, font_size):
+        """Measure text without the cache."""
+        if self.backend != "tk":
+            _, _, width, height, _ = self.canvas.text_layout(text, (self.font_name, font_size))
             return (width, height)
-        return (0, 0)
+        font = self._tk_font(font_size)
+        lines = str(text).split("\n")
+        width = max(font.measure(line) for line in lines)
+        return (width, font.metrics("linespace") * len(lines))
     
     def drawStringAligned(self, x, y, text, font_size=20, color=None, halign=ALIGN_LEFT, valign=ALIGN_BOTTOM):
         """
@@ -211,7 +1143,7 @@ class FunGraphics:
         }
         
         anchor = anchor_map.get((halign, valign), "nw")
-        self.canvas.create_text(x, y, text=text, fill=c, font=font, anchor=anchor)
+        self._draw_item("text", (x, y), text=text, fill=c, font=font, anchor=anchor)
     
     def drawFancyString(self, x, y, text, font_size=20, color=None, shadow_offset=2, outline_thickness=0):
         """
@@ -222,6 +1154,22 @@ class FunGraphics:
         if self.window_closed:
             return
         c = self.color if color is None else self._rgb_to_hex(color)
+        
+        # Render the effects once into a cached image, drawn as a single item
+        if shadow_offset > 0 or outline_thickness > 0:
+            key = (text, self.font_name, font_size, c, shadow_offset, outline_thickness)
+            sprite = self._text_sprites.get(key)
+            if sprite is None:
+                sprite = self._render_fancy_string(text, font_size, c, shadow_offset, outline_thickness)
+                if sprite is not None:
+                    self._text_sprites.put(key, sprite)
+            if sprite is not None:
+                self._frame_images.append(sprite[0])
+                offset = max(outline_thickness, 0)
+                self._draw_item("image", (x - offset, y - offset), image=sprite[0], anchor="nw")
+                return
+        
+        # Without Pillow: one text item per outline offset, shadow and text
         font = (self.font_name, font_size)
         
         # Draw outline
@@ -230,15 +1178,59 @@ class FunGraphics:
             for dx in range(-outline_thickness, outline_thickness + 1):
                 for dy in range(-outline_thickness, outline_thickness + 1):
                     if dx != 0 or dy != 0:
-                        self.canvas.create_text(x + dx, y + dy, text=text, fill=outline_color, font=font, anchor="nw")
+                        self._draw_item("text", (x + dx, y + dy), text=text, fill=outline_color, font=font, anchor="nw")
         
         # Draw shadow
         if shadow_offset > 0:
             shadow_color = "#808080"  # Gray shadow
-            self.canvas.create_text(x + shadow_offset, y + shadow_offset, text=text, fill=shadow_color, font=font, anchor="nw")
+            self._draw_item("text", (x + shadow_offset, y + shadow_offset), text=text, fill=shadow_color, font=font, anchor="nw")
         
         # Draw main text
-        self.canvas.create_text(x, y, text=text, fill=c, font=font, anchor="nw")
+        self._draw_item("text", (x, y), text=text, fill=c, font=font, anchor="nw")
+
+    def _render_fancy_string(self, text, font_size, color, shadow_offset, outline_thickness):
+        """
+        Render drawFancyString's outline, shadow and text into one image.
+        Returns (image, size in bytes), or None without Pillow.
+        """
+        Image, ImageDraw = optional_import("PIL.Image"), optional_import("PIL.ImageDraw")
+        if Image is None:
+            return None
+        font_name = self.font_name
+        if self.backend == "tk":
+            # The typeface Tk really draws font_name with, so that the sprite matches
+            # drawString and getStringSize
+            family = self._tk_font(font_size).actual("family")
+            font_name = font_file(family) or family
+        font = load_pil_font(font_name, font_size)
+        lines = str(text).split("\n")
+        ascent, descent = font.getmetrics()
+        line_height = ascent + descent
+        outline = max(outline_thickness, 0)
+        shadow = max(shadow_offset, 0)
+        width = int(max(font.getlength(line) for line in lines)) + 1 + 2 * outline + shadow
+        height = line_height * len(lines) + 2 * outline + shadow
+        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        # Same layers as the item version: white outline, gray shadow, then the text
+        layers = []
+        if outline > 0:
+            layers.append(("#FFFFFF", 0, outline))
+        if shadow > 0:
+            layers.append(("#808080", shadow, 0))
+        layers.append((color, 0, 0))
+        for layer_color, offset, stroke in layers:
+            mask = Image.new("L", (width, height), 0)
+            draw = ImageDraw.Draw(mask)
+            for i, line in enumerate(lines):
+                position = (outline + offset, outline + offset + i * line_height)
+                draw.text(position, line, font=font, fill=255, stroke_width=stroke, stroke_fill=255)
+            layer = Image.new("RGBA", (width, height), layer_color)
+            layer.putalpha(mask)
+            image = Image.alpha_composite(image, layer)
+        if self.backend == "tk":
+            image = optional_import("PIL.ImageTk").PhotoImage(image)
+        self._counts["images_converted"] += 1
+        return (image, width * height * 4)
     
     def drawTransformedPicture(self, x, y, bitmap, angle=0, scale=1.0):
         """
@@ -248,22 +1240,24 @@ class FunGraphics:
         """
         if self.window_closed:
             return
-        if not bitmap.image:
+        if self._bitmap_image(bitmap) is None:
             return
         
-        # Note: tkinter doesn't support image rotation/scaling directly
-        # This is a simplified version - full implementation would require PIL
-        try:
-            from PIL import Image, ImageTk
-            import math
-            
-            # Get the original PIL image
-            pil_image = bitmap.pil_image if hasattr(bitmap, 'pil_image') else None
-            if pil_image is None:
-                # Fallback: just draw normally
-                self.drawPicture(x, y, bitmap)
-                return
-            
+        # tkinter cannot rotate or scale images: PIL transforms them
+        Image = optional_import("PIL.Image")
+        pil_image = getattr(bitmap, "pil_image", None)
+        if Image is None or pil_image is None:
+            # PIL not available, just draw normally
+            self.drawPicture(x, y, bitmap)
+            return
+        
+        # Rotations are cached by multiples of the angle step, per image file
+        # for shared bitmaps
+        step = self._sprite_angle_step
+        angle = (round(angle / step) * step) % 360 if step > 0 else angle % 360
+        key = (getattr(bitmap, "asset", None) or bitmap, "transform", angle, round(scale, 4))
+        sprite = self._sprites.get(key)
+        if sprite is None:
             # Apply transformations
             if scale != 1.0:
                 new_width = int(pil_image.width * scale)
@@ -274,16 +1268,10 @@ class FunGraphics:
                 pil_image = pil_image.rotate(-angle, expand=True)  # Negative for clockwise
             
             # Convert back to PhotoImage
-            photo = ImageTk.PhotoImage(pil_image)
-            # Store reference to prevent garbage collection
-            if not hasattr(self, '_image_refs'):
-                self._image_refs = []
-            self._image_refs.append(photo)
-            
-            self.canvas.create_image(x, y, image=photo, anchor="c")
-        except ImportError:
-            # PIL not available, just draw normally
-            self.drawPicture(x, y, bitmap)
+            sprite = self._cache_sprite(key, pil_image)
+        
+        self._frame_images.append(sprite[0])
+        self._draw_item("image", (x, y), image=sprite[0], anchor="c")
     
     def drawMirroredPicture(self, x, y, bitmap, horizontal=True):
         """
@@ -292,17 +1280,18 @@ class FunGraphics:
         """
         if self.window_closed:
             return
-        if not bitmap.image:
+        if self._bitmap_image(bitmap) is None:
             return
         
-        try:
-            from PIL import Image, ImageTk, ImageOps
-            
-            pil_image = bitmap.pil_image if hasattr(bitmap, 'pil_image') else None
-            if pil_image is None:
-                self.drawPicture(x, y, bitmap)
-                return
-            
+        ImageOps = optional_import("PIL.ImageOps")
+        pil_image = getattr(bitmap, "pil_image", None)
+        if ImageOps is None or pil_image is None:
+            self.drawPicture(x, y, bitmap)
+            return
+        
+        key = (getattr(bitmap, "asset", None) or bitmap, "mirror", bool(horizontal))
+        sprite = self._sprites.get(key)
+        if sprite is None:
             # Mirror the image
             if horizontal:
                 pil_image = ImageOps.mirror(pil_image)
@@ -310,145 +1299,568 @@ class FunGraphics:
                 pil_image = ImageOps.flip(pil_image)
             
             # Convert to PhotoImage
-            photo = ImageTk.PhotoImage(pil_image)
-            if not hasattr(self, '_image_refs'):
-                self._image_refs = []
-            self._image_refs.append(photo)
-            
-            self.canvas.create_image(x, y, image=photo, anchor="c")
-        except ImportError:
-            self.drawPicture(x, y, bitmap)
+            sprite = self._cache_sprite(key, pil_image)
+        
+        self._frame_images.append(sprite[0])
+        self._draw_item("image", (x, y), image=sprite[0], anchor="c")
     
-    def saveAsPNG(self, filename):
+    def saveAsPNG(self, filename, background=False):
         """
-        Save the current canvas as a PNG image.
-        Requires PIL/Pillow.
+        Save the current frame as a PNG image.
+        The frame is rendered offscreen from the shapes on the canvas, so the window
+        does not need to be visible. Requires PIL/Pillow and NumPy (without NumPy
+        the window area is grabbed from the screen instead).
+        background: compress and write the file on a background thread; the
+        returned thread can be joined to wait for it
         """
+        if not filename.endswith('.png'):
+            filename += '.png'
         try:
-            from PIL import Image, ImageGrab
-            import platform
-            
-            # Get canvas position
-            x = self.root.winfo_rootx() + self.canvas.winfo_x()
-            y = self.root.winfo_rooty() + self.canvas.winfo_y()
-            x1 = x + self.canvas.winfo_width()
-            y1 = y + self.canvas.winfo_height()
+            from PIL import Image
             
-            # Grab the canvas area
-            if platform.system() == "Darwin":  # macOS
-                # On macOS, we need to use a different approach
-                self.canvas.postscript(file=filename + ".ps")
-                print(f"Saved as PostScript: {filename}.ps (PNG export requires additional setup on macOS)")
-            else:
-                img = ImageGrab.grab(bbox=(x, y, x1, y1))
-                if not filename.endswith('.png'):
-                    filename += '.png'
-                img.save(filename)
-                print(f"Saved screenshot: {filename}")
+            try:
+                pixels = self._render_offscreen()
+            except ImportError:
+                self._grab_window(filename)
+                return None
+            # Alpha is always opaque; copy so that later frames do not change the saved image
+            image = Image.fromarray(pixels[:, :, :3].copy())
         except Exception as e:
             print(f"Failed to save image: {e}")
+            return None
+        
+        if not background:
+            self._write_png(image, filename)
+            return None
+        import threading
+        thread = threading.Thread(target=self._write_png, args=(image, filename), daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _write_png(image, filename):
+        try:
+            image.save(filename)
+            print(f"Saved image: {filename}")
+        except Exception as e:
+            print(f"Failed to save image: {e}")
+
+    def _render_offscreen(self):
+        """Rasterize the shapes on the canvas into an H x W x 4 uint8 array."""
+        if self.backend == "numpy":
+            return self.canvas.render()
+        from .raster import RasterCanvas
+        from PIL import ImageTk
+        raster = RasterCanvas(None, width=self.width, height=self.height, bg=self._background_color or "#ffffff")
+        canvas = self.canvas
+        sources = {}  # Tk image name -> pixels
+        if self._fb_image is not None:
+            sources[str(self._fb_image)] = self._framebuffer
+        for item in canvas.find_all():
+            item_type = canvas.type(item)
+            options = {name: canvas.itemcget(item, name) for name in _SNAPSHOT_OPTIONS[item_type]}
+            if item_type == "image":
+                name = options["image"]
+                if name not in sources:
+                    shown = self._shown_images.get(name)
+                    sources[name] = ImageTk.getimage(shown) if shown is not None else None
+                options["image"] = sources[name]
+            getattr(raster, "create_" + item_type)(*canvas.coords(item), **options)
+        return raster.render()
+
+    def _grab_window(self, filename):
+        """Save the window area as seen on the screen."""
+        from PIL import ImageGrab
+        import platform
+        
+        # Get canvas position
+        x = self.root.winfo_rootx() + self.canvas.winfo_x()
+        y = self.root.winfo_rooty() + self.canvas.winfo_y()
+        x1 = x + self.canvas.winfo_width()
+        y1 = y + self.canvas.winfo_height()
+        
+        # Grab the canvas area
+        if platform.system() == "Darwin":  # macOS
+            # On macOS, we need to use a different approach
+            self.canvas.postscript(file=filename[:-4] + ".ps")
+            print(f"Saved as PostScript: {filename[:-4]}.ps (PNG export requires additional setup on macOS)")
+        else:
+            img = ImageGrab.grab(bbox=(x, y, x1, y1))
+            img.save(filename)
+            print(f"Saved screenshot: {filename}")
     
+    def startRecording(self, path, fps=30, format=None, queue_size=8, policy="drop"):
+        """
+        Record every frame shown by syncGameLogic until stopRecording().
+        path: a directory or a pattern like "frame_%05d.png" for PNG frames,
+        a .gif file, or a .raw file or binary stream for raw RGB frames
+        fps: playback rate of the recording
+        format: "png", "gif" or "raw" (guessed from the path by default)
+        queue_size: frames waiting to be written at most
+        policy: when the writer falls behind, "drop" frames or "block" the game loop
+        Frames are rendered offscreen like saveAsPNG and written on a background
+        thread. Requires NumPy and Pillow.
+        """
+        from .recorder import FrameRecorder, format_from_path
+        self.stopRecording()
+        self._recorder = FrameRecorder(path, fps, format or format_from_path(path), queue_size, policy)
+
+    def stopRecording(self):
+        """
+        Stop recording, wait for the queued frames to be written and return
+        the recording statistics (see getRecordingStats), None if not recording.
+        """
+        if self._recorder is None:
+            return None
+        recorder, self._recorder = self._recorder, None
+        return recorder.close()
+
+    def getRecordingStats(self):
+        """
+        Statistics of the current recording, as a dictionary: frames_captured,
+        frames_written, frames_dropped, queue_depth, max_queue_depth,
+        write_time (seconds spent by the writer) and error (None if none).
+        """
+        return self._recorder.stats() if self._recorder is not None else None
+
+    def _record_frame(self):
+        """Hand a copy of the current frame to the recorder, unless it would be dropped."""
+        if not self._recorder.ready():
+            return
+        import numpy as np
+        self._recorder.submit(np.array(self._render_offscreen()[:, :, :3]))
+
     # Layer management
     def drawBackground(self):
-        """Switch to drawing on the background layer."""
+        """
+        Switch to drawing on the background layer, below the foreground.
+        The background is not erased by clear(): draw it once, or draw the same
+        shapes every frame, which then costs almost nothing. A frame that calls
+        drawBackground() replaces the shapes that differ from the previous background.
+        """
         self.current_layer = 'background'
+        self._background_redrawn = True
     
     def drawForeground(self):
-        """Switch to drawing on the foreground layer."""
+        """Switch to drawing on the foreground layer (the default)."""
         self.current_layer = 'foreground'
 
+    def clearBackground(self):
+        """Erase the background layer."""
+        if self.window_closed:
+            return
+        if self._background_commands:
+            self.canvas.delete("bg")
+            self._counts["items_deleted"] += len(self._background_commands)
+            self._counts["tk_calls"] += 1
+        self._background_commands = []
+        self._background_shapes = []
+        self._background_index = None
+        self._background_cursor = 0
+
     # Input handling
     def setKeyManager(self, listener):
         """
         Register a listener object that has keyPressed and keyReleased methods.
         """
         self.key_listeners.append(listener)
+        self._add_handlers(listener, "keyPressed", "keyReleased")
         
+    def _add_handlers(self, listener, *methods):
+        """Add the listener's methods (those it has) to the dispatch table."""
+        for method in methods:
+            handler = getattr(listener, method, None)
+            if handler is not None:
+                self._handlers[method].append(handler)
+
     def _on_key_press(self, event):
-        class MockEvent:
-            def __init__(self, key):
-                self.key = key
-        
-        mock_event = MockEvent(event.keysym)
-        for listener in self.key_listeners:
-            if hasattr(listener, 'keyPressed'):
-                listener.keyPressed(mock_event)
+        self._input_queue.append((time.perf_counter(), "press", event.keysym))
+        handlers = self._handlers["keyPressed"]
+        if handlers:
+            key_event = KeyEvent(event.keysym)
+            for handler in handlers:
+                handler(key_event)
 
     def _on_key_release(self, event):
-        class MockEvent:
-            def __init__(self, key):
-                self.key = key
-        
-        mock_event = MockEvent(event.keysym)
-        for listener in self.key_listeners:
-            if hasattr(listener, 'keyReleased'):
-                listener.keyReleased(mock_event)
+        self._input_queue.append((time.perf_counter(), "release", event.keysym))
+        handlers = self._handlers["keyReleased"]
+        if handlers:
+            key_event = KeyEvent(event.keysym)
+            for handler in handlers:
+                handler(key_event)
     
     def addMouseListener(self, listener):
         """
         Add a mouse listener object that has mouseClicked method.
         """
         self.mouse_listeners.append(listener)
+        self._add_handlers(listener, "mouseClicked")
     
     def addMouseMotionListener(self, listener):
         """
         Add a mouse motion listener object that has mouseMoved method.
         """
         self.mouse_motion_listeners.append(listener)
+        self._add_handlers(listener, "mouseMoved")
+
+    def setMotionCoalescing(self, enabled):
+        """
+        When enabled, mouseMoved is called at most once per frame, in
+        syncGameLogic, with the latest mouse position, instead of once for
+        every motion event.
+        """
+        self._coalesce_motion = bool(enabled)
+        if not enabled:
+            self._dispatch_motion()
     
     def _on_mouse_click(self, event):
-        class MockEvent:
-            def __init__(self, x, y, button):
-                self.x = x
-                self.y = y
-                self.button = button
-        
-        mock_event = MockEvent(event.x, event.y, event.num)
-        for listener in self.mouse_listeners:
-            if hasattr(listener, 'mouseClicked'):
-                listener.mouseClicked(mock_event)
+        self._mouse_position = (event.x, event.y)
+        self._input_queue.append((time.perf_counter(), "button_press", event.num))
+        handlers = self._handlers["mouseClicked"]
+        if handlers:
+            mouse_event = MouseEvent(event.x, event.y, event.num)
+            for handler in handlers:
+                handler(mouse_event)
     
+    def _on_mouse_release(self, event):
+        self._mouse_position = (event.x, event.y)
+        self._input_queue.append((time.perf_counter(), "button_release", event.num))
+
     def _on_mouse_motion(self, event):
-        class MockEvent:
-            def __init__(self, x, y):
-                self.x = x
-                self.y = y
-        
-        mock_event = MockEvent(event.x, event.y)
-        for listener in self.mouse_motion_listeners:
-            if hasattr(listener, 'mouseMoved'):
-                listener.mouseMoved(mock_event)
+        self._mouse_position = (event.x, event.y)
+        if self._coalesce_motion:
+            self._pending_motion = (event.x, event.y)
+            return
+        handlers = self._handlers["mouseMoved"]
+        if handlers:
+            mouse_event = MouseEvent(event.x, event.y)
+            for handler in handlers:
+                handler(mouse_event)
+
+    def _dispatch_motion(self):
+        """Deliver the coalesced mouse motion of the frame, if any."""
+        if self._pending_motion is not None:
+            x, y = self._pending_motion
+            self._pending_motion = None
+            mouse_event = MouseEvent(x, y)
+            for handler in self._handlers["mouseMoved"]:
+                handler(mouse_event)
     
+    def _update_input_state(self):
+        """Apply the input events received during the frame to the polled state."""
+        events, self._input_queue = self._input_queue, []
+        self._input_events = events
+        self._keys_pressed = set()
+        self._keys_released = set()
+        released = set()
+        for _, kind, value in events:
+            if kind == "press":
+                if value in released:
+                    # Auto-repeat sends release + press pairs: the key stayed down
+                    released.discard(value)
+                elif value not in self._keys_down:
+                    # (repeated presses without release are auto-repeat too)
+                    self._keys_down.add(value)
+                    self._keys_pressed.add(value)
+            elif kind == "release":
+                if value in self._keys_down:
+                    released.add(value)
+            elif kind == "button_press":
+                self._buttons_down.add(value)
+            else:
+                self._buttons_down.discard(value)
+        self._keys_down -= released
+        self._keys_released = released
+
+    def isKeyDown(self, key):
+        """True while the key (e.g. K_LEFT or 'a') is held down, as of the last syncGameLogic."""
+        return key in self._keys_down
+
+    def keysPressedThisFrame(self):
+        """The keys pressed during the last frame (auto-repeat not included)."""
+        return frozenset(self._keys_pressed)
+
+    def keysReleasedThisFrame(self):
+        """The keys released during the last frame."""
+        return frozenset(self._keys_released)
+
+    def mousePosition(self):
+        """The latest (x, y) position of the mouse over the window."""
+        return self._mouse_position
+
+    def mouseButtonsDown(self):
+        """The mouse buttons held down (see MOUSE_BUTTON_ constants), as of the last syncGameLogic."""
+        return frozenset(self._buttons_down)
+
+    def inputEventsThisFrame(self):
+        """
+        The key and button events of the last frame in order, as
+        (time, event, key or button) tuples; event is "press", "release",
+        "button_press" or "button_release" and time comes from time.perf_counter().
+        """
+        return list(self._input_events)
+
     def _on_window_close(self):
         """Handle window close event."""
         self.window_closed = True
+        self.stopRecording()
         self.root.destroy()
         import sys
         sys.exit(0)
         
+    def setFrameScheduler(self, mode="precise", overrun="skip"):
+        """
+        Choose how syncGameLogic paces the frames.
+        mode: "sleep" (default) sleeps for the rest of the frame; "precise" waits
+        for fixed deadlines (frame n is shown at start + n / fps), sleeping then
+        spinning for the last millisecond, so frames neither drift nor jitter
+        overrun: when a frame ends after its deadline, "skip" the missed deadlines
+        and continue from the next one, or "catchup" by running the next frames
+        without waiting (at most SCHEDULER_MAX_CATCHUP frames behind)
+        """
+        if mode not in ("sleep", "precise"):
+            raise ValueError(f"Unknown scheduler mode: {mode!r} (expected 'sleep' or 'precise')")
+        if overrun not in ("skip", "catchup"):
+            raise ValueError(f"Unknown overrun policy: {overrun!r} (expected 'skip' or 'catchup')")
+        self._scheduler = overrun if mode == "precise" else None
+        self._next_deadline = None
+
+    def getSkippedFrames(self):
+        """Number of frame deadlines missed and skipped by the precise scheduler."""
+        return self._frames_skipped
+
+    def _frame_deadline(self, fps):
+        """Time (perf_counter) at which the current frame ends, on a fixed grid of deadlines."""
+        if self._next_deadline is None or fps != self._scheduled_fps:
+            self._next_deadline = time.perf_counter() + 1.0 / fps
+            self._scheduled_fps = fps
+        return self._next_deadline
+
+    def _schedule_next_frame(self, fps):
+        """Move to the next frame deadline, applying the overrun policy if it already passed."""
+        period = 1.0 / fps
+        now = time.perf_counter()
+        deadline = self._next_deadline + period
+        if deadline <= now:
+            late = int((now - deadline) / period) + 1
+            if self._scheduler != "catchup" or late > SCHEDULER_MAX_CATCHUP:
+                # Stay on the same grid of deadlines, after the ones already missed
+                self._frames_skipped += late
+                deadline += late * period
+        self._next_deadline = deadline
+
+    def _wait_next_frame(self, fps):
+        """Wait for the next frame deadline of the precise scheduler."""
+        deadline = self._frame_deadline(fps)
+        remaining = deadline - time.perf_counter()
+        if remaining > SCHEDULER_SPIN_TIME:
+            time.sleep(remaining - SCHEDULER_SPIN_TIME)
+        while time.perf_counter() < deadline:
+            pass
+        self._schedule_next_frame(fps)
+
     def syncGameLogic(self, fps):
         """
         Process events and update display.
         Should be called in the game loop.
+        Returns the time elapsed since the previous call, in seconds.
+        """
+        sync_start, update_start = self._present_frame(fps)
+        
+        wait_start = time.perf_counter()
+        skipped = self._frames_skipped
+        if self._scheduler is not None:
+            self._wait_next_frame(fps)
+        else:
+            # Sleep to maintain FPS
+            current_time = time.time()
+            elapsed = current_time - self.last_time
+            target_frame_time = 1.0 / fps
+            if elapsed < target_frame_time:
+                time.sleep(target_frame_time - elapsed)
+            self.last_time = time.time()
+        return self._end_frame(sync_start, update_start, wait_start, skipped)
+
+    async def nextFrame(self, fps):
+        """
+        Asyncio version of syncGameLogic, for game loops written as coroutines:
+            while True:
+                ...draw...
+                await fg.nextFrame(60)
+        Until the frame deadline (see setFrameScheduler, the deadlines are the
+        precise ones), other tasks run and Tk events keep being processed.
+        Returns the time elapsed since the previous frame, in seconds.
+        """
+        import asyncio
+        sync_start, update_start = self._present_frame(fps)
+        
+        wait_start = time.perf_counter()
+        skipped = self._frames_skipped
+        deadline = self._frame_deadline(fps)
+        waited = False
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, ASYNC_PUMP_INTERVAL))
+            waited = True
+            self._pump_events()
+        if not waited:
+            # Late frame: still let the other tasks run
+            await asyncio.sleep(0)
+        self._schedule_next_frame(fps)
+        return self._end_frame(sync_start, update_start, wait_start, skipped)
+
+    async def pumpEvents(self, interval=ASYNC_PUMP_INTERVAL):
+        """
+        Keep processing Tk events every `interval` seconds, for as long as the
+        window is open. Run it as a task when the game awaits other things
+        than nextFrame for long: asyncio.create_task(fg.pumpEvents())
+        """
+        import asyncio
+        while not self.window_closed:
+            self._pump_events()
+            await asyncio.sleep(interval)
+
+    def _present_frame(self, fps):
+        """
+        Finish the frame and let Tk show it and process the events.
+        Returns the perf_counter times at which the frame ended and Tk was called.
         """
         if self.window_closed:
             import sys
             sys.exit(0)
-        
+
+        if not self._submitted_frames.empty():
+            self._draw_submitted_frame()
+        sync_start = time.perf_counter()
+        self._end_background_frame()
+        if self._show_stats:
+            self._draw_stats_overlay(fps)
+        if self.retained:
+            self._delete_unused_items()
+        if self._framebuffer is not None:
+            self._upload_framebuffer()
+        if self._recorder is not None:
+            self._record_frame()
+
+        update_start = time.perf_counter()
+        self.root.update_idletasks()
+        self._pump_events()
+        if self._pending_motion is not None:
+            self._dispatch_motion()
+        self._update_input_state()
+        return sync_start, update_start
+
+    def submitFrame(self, commands, block=True, timeout=None):
+        """
+        Hand a frame recorded in a CommandBuffer to the window, from any thread.
+        The window's thread draws it at its next syncGameLogic (one submitted
+        frame per call). At most SUBMITTED_FRAMES frames wait to be drawn:
+        when they are, the call waits for a free place (block=True, at most
+        `timeout` seconds) or returns False right away (block=False).
+        Returns True when the frame was queued.
+        """
+        import queue
+        try:
+            # The list itself is queued, so the buffer can be reset and reused
+            self._submitted_frames.put(commands.commands, block, timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def _draw_submitted_frame(self):
+        """Draw the oldest frame submitted by another thread."""
+        import queue
+        try:
+            commands = self._submitted_frames.get_nowait()
+        except queue.Empty:
+            return
+        for name, args, kwargs in commands:
+            getattr(self, name)(*args, **kwargs)
+
+    def _pump_events(self):
+        """Let Tk process the pending events."""
         try:
-            self.root.update_idletasks()
             self.root.update()
-        except tk.TclError:
+        except self._tcl_error:
             # Window closed
             self.window_closed = True
+            self.stopRecording()
             import sys
             sys.exit(0)
-        
-        # Sleep to maintain FPS
-        current_time = time.time()
-        elapsed = current_time - self.last_time
-        target_frame_time = 1.0 / fps
-        if elapsed < target_frame_time:
-            time.sleep(target_frame_time - elapsed)
-        self.last_time = time.time()
+
+    def _end_frame(self, sync_start, update_start, wait_start, skipped):
+        """Record the frame statistics, returns the frame time."""
+        now = time.perf_counter()
+        dt = now - self._last_sync
+        self._end_frame_stats(frame_time=dt,
+                              user_time=sync_start - self._last_sync,
+                              sync_time=update_start - sync_start,
+                              update_time=wait_start - update_start,
+                              sleep_time=now - wait_start,
+                              missed_deadlines=self._frames_skipped - skipped)
+        self._last_sync = now
+        return dt
+
+    def _end_frame_stats(self, **times):
+        """Store the statistics of the frame that just ended and reset the counters."""
+        stats = times
+        stats.update(self._counts)
+        for name in self._counts:
+            self._counts[name] = 0
+        self._frame_number += 1
+        stats["frame"] = self._frame_number
+        self._frame_times.append(stats["frame_time"])
+        self._frame_stats = stats
+
+    def getFrameStats(self):
+        """
+        Statistics of the last frame, as a dictionary (times in seconds):
+        frame_time (since the previous frame), user_time (spent by the game
+        between two syncGameLogic calls), sync_time (finishing the frame:
+        uploads, recording, overlay), update_time (Tk drawing and events),
+        sleep_time (waiting for the next frame), missed_deadlines (see
+        setFrameScheduler), items_created, items_reused and items_deleted
+        (canvas items), tk_calls (canvas and image commands issued) and
+        images_converted (images made or uploaded for the canvas).
+        Over the last FRAME_STATS_HISTORY frames: fps and the frame time
+        percentiles frame_time_p50, frame_time_p95 and frame_time_p99.
+        Returns None before the first frame.
+        """
+        if self._frame_stats is None:
+            return None
+        stats = dict(self._frame_stats)
+        times = sorted(self._frame_times)
+        stats["fps"] = len(times) / sum(times) if sum(times) > 0 else 0.0
+        for p in (50, 95, 99):
+            stats[f"frame_time_p{p}"] = times[min(len(times) - 1, len(times) * p // 100)]
+        return stats
+
+    def showFrameStats(self, enabled=True):
+        """Show or hide an overlay with the frame rate and a graph of the last frame times."""
+        self._show_stats = bool(enabled)
+
+    def _draw_stats_overlay(self, fps):
+        """Draw the statistics overlay in the top-right corner, on top of the frame."""
+        stats = self.getFrameStats()
+        if stats is None:
+            return
+        graph_width, graph_height = min(120, FRAME_STATS_HISTORY), 40
+        x0, y0 = self.width - graph_width - 8, 4
+        self._draw_item("fillrect", (x0 - 4, y0, self.width - 4, y0 + graph_height + 40),
+                        fill="#202020", outline="", width=1)
+        text = (f"{stats['fps']:.1f} FPS  {stats['frame_time'] * 1000:.1f} ms\n"
+                f"p95 {stats['frame_time_p95'] * 1000:.1f}  p99 {stats['frame_time_p99'] * 1000:.1f}")
+        self._draw_item("text", (x0, y0 + 2), text=text, fill="#ffffff", font=(self.font_name, 8), anchor="nw")
+        # Frame times, the middle of the graph being the frame budget (1 / fps)
+        bottom = y0 + graph_height + 36
+        budget = bottom - graph_height / 2
+        self._draw_item("line", (x0, budget, x0 + graph_width, budget), fill="#808080", width=1)
+        times = list(self._frame_times)[-graph_width:]
+        points = []
+        for i, frame_time in enumerate(times):
+            points += (x0 + i, bottom - min(graph_height, frame_time * fps * graph_height / 2))
+        if len(points) >= 4:
+            self._draw_item("line", points, fill="#40ff40", width=1)
 
@@ -0,0 +1,122 @@
+"""
+Picking for FunGraphics: find the shapes under a point or in a rectangle.
+
+Shapes drawn with a pick id (see FunGraphics.setPickId) are added to a
+uniform grid of PICK_CELL_SIZE pixel cells, so a query only tests the few
+shapes whose bounding boxes overlap the cells it covers. The grid only covers
+the window: points outside it cannot be picked, and a huge shape costs no
+more than one covering the window.
+"""
+
+PICK_CELL_SIZE = 32
+
+
+class PickShape:
+    """A shape that can be picked: its id, stacking order, geometry and bounding box."""
+    __slots__ = ("pick_id", "order", "kind", "coords", "half_width", "bbox")
+
+    def __init__(self, pick_id, order, kind, coords, half_width, bbox):
+        self.pick_id = pick_id
+        self.order = order
+        self.kind = kind
+        self.coords = coords
+        self.half_width = half_width
+        self.bbox = bbox
+
+    def contains(self, x, y):
+        """True if (x, y) is on the shape; closed shapes are hit anywhere inside."""
+        x0, y0, x1, y1 = self.bbox
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            return False
+        kind = self.kind
+        if kind == "oval" or kind == "filloval":
+            c = self.coords
+            cx, cy = (c[0] + c[2]) / 2, (c[1] + c[3]) / 2
+            rx, ry = abs(c[2] - c[0]) / 2 + self.half_width, abs(c[3] - c[1]) / 2 + self.half_width
+            return rx > 0 and ry > 0 and ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1
+        if kind == "line":
+            return _near_segments(self.coords, x, y, self.half_width)
+        if kind == "polygon" or kind == "fillpolygon":
+            return _inside_polygon(self.coords, x, y) or _near_segments(
+                self.coords + self.coords[:2], x, y, self.half_width)
+        # Rectangles, text and images: the bounding box
+        return True
+
+
+def _near_segments(coords, x, y, distance):
+    """True if (x, y) is within distance of the polyline through coords."""
+    distance2 = distance * distance
+    for i in range(0, len(coords) - 3, 2):
+        ax, ay, bx, by = coords[i], coords[i + 1], coords[i + 2], coords[i + 3]
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length2))
+        px, py = ax + t * dx - x, ay + t * dy - y
+        if px * px + py * py <= distance2:
+            return True
+    return False
+
+
+def _inside_polygon(coords, x, y):
+    """Even-odd rule, like the canvas fills polygons."""
+    inside = False
+    xj, yj = coords[-2], coords[-1]
+    for i in range(0, len(coords) - 1, 2):
+        xi, yi = coords[i], coords[i + 1]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        xj, yj = xi, yi
+    return inside
+
+
+class SpatialIndex:
+    """Uniform grid of PickShapes over a width x height window."""
+
+    def __init__(self, width, height, cell_size=PICK_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = max(1, -(-int(width) // cell_size))
+        self.rows = max(1, -(-int(height) // cell_size))
+        self._cells = {}  # (column, row) -> [PickShape]
+        self.count = 0
+
+    def clear(self):
+        self._cells = {}
+        self.count = 0
+
+    def _cell_ranges(self, x0, y0, x1, y1):
+        """The columns and rows of the cells overlapping a rectangle, clipped to the window."""
+        size = self.cell_size
+        columns = range(max(0, int(x0 // size)), int(min(x1 // size, self.columns - 1)) + 1)
+        rows = range(max(0, int(y0 // size)), int(min(y1 // size, self.rows - 1)) + 1)
+        return columns, rows
+
+    def add(self, shape):
+        columns, rows = self._cell_ranges(*shape.bbox)
+        cells = self._cells
+        for row in rows:
+            for column in columns:
+                cell = cells.get((column, row))
+                if cell is None:
+                    cells[(column, row)] = [shape]
+                else:
+                    cell.append(shape)
+        self.count += 1
+
+    def at_point(self, x, y):
+        """The shapes containing (x, y), the topmost first."""
+        cell = self._cells.get((int(x // self.cell_size), int(y // self.cell_size)))
+        if not cell:
+            return []
+        return [shape for shape in reversed(cell) if shape.contains(x, y)]
+
+    def in_rect(self, x0, y0, x1, y1):
+        """The shapes whose bounding boxes overlap the rectangle, the topmost first."""
+        columns, rows = self._cell_ranges(x0, y0, x1, y1)
+        found = {}
+        for row in rows:
+            for column in columns:
+                for shape in self._cells.get((column, row), ()):
+                    bx0, by0, bx1, by1 = shape.bbox
+                    if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                        found[shape.order] = shape
+        return [found[order] for order in sorted(found, reverse=True)]
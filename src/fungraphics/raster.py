@@ -0,0 +1,553 @@
+"""
+Headless raster backend for FunGraphics.
+
+RasterRoot and RasterCanvas stand in for tk.Tk and tk.Canvas: they accept the
+calls FunGraphics makes on its window and canvas, keep the canvas items, and
+rasterize them into an H x W x 4 uint8 NumPy array instead of a screen.
+No display is needed. Drawing text requires Pillow.
+"""
+import math
+
+import numpy as np
+
+from .utils import anchor_offset, load_pil_font
+
+# Tk defaults for the options FunGraphics does not always pass
+_DEFAULT_OPTIONS = {
+    "rectangle": {"fill": "", "outline": "black", "width": 1},
+    "oval": {"fill": "", "outline": "black", "width": 1},
+    "line": {"fill": "black", "width": 1},
+    "polygon": {"fill": "black", "outline": "", "width": 1},
+    "text": {"fill": "black", "text": "", "font": ("TkDefaultFont", 10), "anchor": "center"},
+    "image": {"image": None, "anchor": "center"},
+}
+
+_NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+}
+
+_colors = {}
+
+def parse_color(color):
+    """Convert a Tk color ("#rrggbb" or a basic name) to an (r, g, b) tuple, None if empty."""
+    if not color:
+        return None
+    rgb = _colors.get(color)
+    if rgb is None:
+        if color.startswith("#") and len(color) == 7:
+            rgb = (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+        elif color.startswith("#") and len(color) == 4:
+            rgb = tuple(int(c, 16) * 17 for c in color[1:])
+        else:
+            rgb = _NAMED_COLORS.get(color.lower(), (0, 0, 0))
+        _colors[color] = rgb
+    return rgb
+
+
+def _parse_font(font):
+    """Split a Tk font description into (name, size)."""
+    if isinstance(font, str):
+        if font.startswith("{"):
+            # Family with spaces, as Tk returns it: "{Comic Sans MS} 20"
+            end = font.find("}")
+            rest = font[end + 1:].split()
+            return font[1:end], int(rest[0]) if rest and rest[0].lstrip("-").isdigit() else 10
+        parts = font.split()
+        if len(parts) >= 2 and parts[-1].lstrip("-").isdigit():
+            return " ".join(parts[:-1]), int(parts[-1])
+        return font, 10
+    return font[0], int(font[1])
+
+
+class _RasterEvent:
+    """Event passed to the handlers bound with bind()."""
+    def __init__(self, widget, keysym="", x=0, y=0, num=0):
+        self.widget = widget
+        self.keysym = keysym
+        self.x = x
+        self.y = y
+        self.num = num
+
+
+class _RasterWidget:
+    def __init__(self):
+        self._bindings = {}
+
+    def bind(self, sequence, func):
+        self._bindings[sequence] = func
+
+    def event_generate(self, sequence, **kw):
+        """Deliver a synthetic event (keysym, x, y, num) to the handler bound to sequence."""
+        handler = self._bindings.get(sequence)
+        if handler is not None:
+            handler(_RasterEvent(self, **kw))
+
+
+class RasterRoot(_RasterWidget):
+    """Window stand-in: there is nothing to show, so updates are no-ops."""
+    def __init__(self):
+        super().__init__()
+        self.destroyed = False
+        self._protocols = {}
+
+    def title(self, title):
+        self._title = title
+
+    def geometry(self, geometry):
+        pass
+
+    def resizable(self, width, height):
+        pass
+
+    def protocol(self, name, func):
+        self._protocols[name] = func
+
+    def update(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class _Item:
+    __slots__ = ("type", "coords", "options", "tags")
+
+    def __init__(self, item_type, coords, options, tags):
+        self.type = item_type
+        self.coords = coords
+        self.options = options
+        self.tags = tags
+
+
+class RasterCanvas(_RasterWidget):
+    """
+    Canvas stand-in drawing into a NumPy array.
+    Items are kept like on a Tk canvas and rasterized on demand by render():
+    new items are painted on top of the previous result, any other change
+    (delete, coords, itemconfigure, restacking, background) repaints everything.
+    """
+    def __init__(self, master, width, height, bg="white", **kw):
+        super().__init__()
+        self.master = master
+        self.width = int(width)
+        self.height = int(height)
+        self._bg = parse_color(bg)
+        self._items = {}
+        self._order = []
+        self._next_id = 1
+        self._pixels = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        self._rendered = 0
+        self._stale = True
+        self._rasterizers = {
+            "rectangle": self._draw_rectangle,
+            "oval": self._draw_oval,
+            "line": self._draw_line,
+            "polygon": self._draw_polygon,
+            "text": self._draw_text,
+            "image": self._draw_image,
+        }
+
+    def pack(self, *args, **kw):
+        pass
+
+    def configure(self, **kw):
+        if "bg" in kw or "background" in kw:
+            self._bg = parse_color(kw.get("bg", kw.get("background")))
+            self._stale = True
+
+    config = configure
+
+    # Items
+
+    def _create(self, item_type, coords, options):
+        if len(coords) == 1 and isinstance(coords[0], (list, tuple)):
+            coords = coords[0]
+        tags = options.pop("tags", ())
+        if isinstance(tags, str):
+            tags = tuple(tags.split())
+        merged = dict(_DEFAULT_OPTIONS[item_type])
+        merged.update(options)
+        item = self._next_id
+        self._next_id += 1
+        self._items[item] = _Item(item_type, [float(c) for c in coords], merged, tuple(tags))
+        self._order.append(item)
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self._create("oval", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def create_polygon(self, *coords, **options):
+        return self._create("polygon", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", coords, options)
+
+    def _find(self, tag_or_id):
+        """Ids matching a tag or an id, in stacking order."""
+        if tag_or_id == "all":
+            return list(self._order)
+        if isinstance(tag_or_id, int) or (isinstance(tag_or_id, str) and tag_or_id.isdigit()):
+            item = int(tag_or_id)
+            return [item] if item in self._items else []
+        return [item for item in self._order if tag_or_id in self._items[item].tags]
+
+    def find_all(self):
+        return tuple(self._order)
+
+    def find_withtag(self, tag_or_id):
+        return tuple(self._find(tag_or_id))
+
+    def type(self, tag_or_id):
+        items = self._find(tag_or_id)
+        return self._items[items[0]].type if items else None
+
+    def gettags(self, tag_or_id):
+        items = self._find(tag_or_id)
+        return self._items[items[0]].tags if items else ()
+
+    def delete(self, *tags_or_ids):
+        removed = set()
+        for tag_or_id in tags_or_ids:
+            removed.update(self._find(tag_or_id))
+        if not removed:
+            return
+        for item in removed:
+            del self._items[item]
+        if len(removed) == len(self._order):
+            self._order = []
+        else:
+            self._order = [item for item in self._order if item not in removed]
+        self._stale = True
+
+    def coords(self, tag_or_id, *coords):
+        items = self._find(tag_or_id)
+        if not items:
+            return []
+        if not coords:
+            return list(self._items[items[0]].coords)
+        if len(coords) == 1 and isinstance(coords[0], (list, tuple)):
+            coords = coords[0]
+        for item in items:
+            self._items[item].coords = [float(c) for c in coords]
+        self._stale = True
+
+    def itemconfigure(self, tag_or_id, **options):
+        tags = options.pop("tags", None)
+        if isinstance(tags, str):
+            tags = tuple(tags.split())
+        for item in self._find(tag_or_id):
+            self._items[item].options.update(options)
+            if tags is not None:
+                self._items[item].tags = tuple(tags)
+        self._stale = True
+
+    itemconfig = itemconfigure
+
+    def itemcget(self, tag_or_id, option):
+        items = self._find(tag_or_id)
+        return self._items[items[0]].options.get(option, "") if items else ""
+
+    def move(self, tag_or_id, dx, dy):
+        for item in self._find(tag_or_id):
+            coords = self._items[item].coords
+            for i in range(0, len(coords) - 1, 2):
+                coords[i] += dx
+                coords[i + 1] += dy
+        self._stale = True
+
+    def tag_raise(self, tag_or_id, above=None):
+        self._restack(tag_or_id, above, raise_items=True)
+
+    def tag_lower(self, tag_or_id, below=None):
+        self._restack(tag_or_id, below, raise_items=False)
+
+    lift = tag_raise
+    lower = tag_lower
+
+    def _restack(self, tag_or_id, reference, raise_items):
+        moved = self._find(tag_or_id)
+        if not moved:
+            return
+        moved_set = set(moved)
+        rest = [item for item in self._order if item not in moved_set]
+        if reference is None:
+            index = len(rest) if raise_items else 0
+        else:
+            refs = [item for item in self._find(reference) if item not in moved_set]
+            if not refs:
+                raise ValueError(f'tagOrId "{reference}" doesn\'t match any items')
+            index = rest.index(refs[-1]) + 1 if raise_items else rest.index(refs[0])
+        self._order = rest[:index] + moved + rest[index:]
+        self._stale = True
+
+    def bbox(self, *tags_or_ids):
+        """Bounding box (x1, y1, x2, y2) of the given items, None if there is none."""
+        boxes = []
+        for tag_or_id in tags_or_ids:
+            for item in self._find(tag_or_id):
+                box = self._item_bbox(self._items[item])
+                if box is not None:
+                    boxes.append(box)
+        if not boxes:
+            return None
+        return (int(math.floor(min(b[0] for b in boxes))), int(math.floor(min(b[1] for b in boxes))),
+                int(math.ceil(max(b[2] for b in boxes))), int(math.ceil(max(b[3] for b in boxes))))
+
+    def _item_bbox(self, item):
+        c = item.coords
+        if item.type == "text":
+            _, _, width, height, _ = self.text_layout(item.options["text"], item.options["font"])
+            dx, dy = anchor_offset(item.options["anchor"], width, height)
+            return (c[0] + dx, c[1] + dy, c[0] + dx + width, c[1] + dy + height)
+        if item.type == "image":
+            pixels = self._image_pixels(item.options["image"])
+            if pixels is None:
+                return None
+            height, width = pixels.shape[:2]
+            dx, dy = anchor_offset(item.options["anchor"], width, height)
+            return (c[0] + dx, c[1] + dy, c[0] + dx + width, c[1] + dy + height)
+        if len(c) < 2:
+            return None
+        half = float(item.options.get("width", 1)) / 2
+        xs, ys = c[0::2], c[1::2]
+        return (min(xs) - half, min(ys) - half, max(xs) + half, max(ys) + half)
+
+    # Rasterization
+
+    def render(self):
+        """
+        Rasterize the canvas and return the H x W x 4 uint8 RGBA array.
+        The array is a read-only view, it stays valid until the next render().
+        """
+        if self._stale:
+            self._pixels[:, :, :3] = self._bg if self._bg is not None else (255, 255, 255)
+            self._pixels[:, :, 3] = 255
+            self._rendered = 0
+            self._stale = False
+        for item in self._order[self._rendered:]:
+            self._rasterize(self._items[item])
+        self._rendered = len(self._order)
+        view = self._pixels.view()
+        view.flags.writeable = False
+        return view
+
+    def _rasterize(self, item):
+        self._rasterizers[item.type](item)
+
+    def _clip(self, x0, y0, x1, y1):
+        """Integer pixel box clipped to the canvas, or None if it is empty."""
+        x0 = max(int(math.floor(x0)), 0)
+        y0 = max(int(math.floor(y0)), 0)
+        x1 = min(int(math.ceil(x1)), self.width)
+        y1 = min(int(math.ceil(y1)), self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def _grid(self, box):
+        """Pixel center coordinates of a clipped box, as a row and a column."""
+        x0, y0, x1, y1 = box
+        return (np.arange(x0, x1, dtype=np.float64) + 0.5)[None, :], (np.arange(y0, y1, dtype=np.float64) + 0.5)[:, None]
+
+    def _fill_box(self, x0, y0, x1, y1, rgb):
+        box = self._clip(x0, y0, x1, y1)
+        if box is not None:
+            self._pixels[box[1]:box[3], box[0]:box[2], :3] = rgb
+
+    def _fill_mask(self, box, mask, rgb):
+        self._pixels[box[1]:box[3], box[0]:box[2], :3][mask] = rgb
+
+    def _blend(self, x, y, rgba):
+        """Alpha-blend an RGBA (or RGB) array with its top-left corner at (x, y)."""
+        height, width = rgba.shape[:2]
+        box = self._clip(x, y, x + width, y + height)
+        if box is None:
+            return
+        x0, y0, x1, y1 = box
+        sx, sy = x0 - int(math.floor(x)), y0 - int(math.floor(y))
+        src = rgba[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        dst = self._pixels[y0:y1, x0:x1, :3]
+        if src.shape[2] == 3:
+            dst[...] = src
+            return
+        alpha = src[:, :, 3:4].astype(np.uint16)
+        dst[...] = ((src[:, :, :3] * alpha + dst * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+    @staticmethod
+    def _round(value):
+        return int(math.floor(value + 0.5))
+
+    def _draw_rectangle(self, item):
+        c = item.coords
+        x1, x2 = sorted((self._round(c[0]), self._round(c[2])))
+        y1, y2 = sorted((self._round(c[1]), self._round(c[3])))
+        fill = parse_color(item.options["fill"])
+        if fill is not None:
+            self._fill_box(x1, y1, x2, y2, fill)
+        outline = parse_color(item.options["outline"])
+        width = int(float(item.options["width"]))
+        if outline is None or width <= 0:
+            return
+        ox1, oy1, ox2, oy2 = x1 - width // 2, y1 - width // 2, x2 + width // 2, y2 + width // 2
+        ix1, iy1, ix2, iy2 = x1 + (width + 1) // 2, y1 + (width + 1) // 2, x2 - (width + 1) // 2, y2 - (width + 1) // 2
+        if ix1 >= ix2 or iy1 >= iy2:
+            self._fill_box(ox1, oy1, ox2, oy2, outline)
+            return
+        self._fill_box(ox1, oy1, ox2, iy1, outline)
+        self._fill_box(ox1, iy2, ox2, oy2, outline)
+        self._fill_box(ox1, iy1, ix1, iy2, outline)
+        self._fill_box(ix2, iy1, ox2, iy2, outline)
+
+    def _draw_oval(self, item):
+        c = item.coords
+        x1, x2 = sorted((c[0], c[2]))
+        y1, y2 = sorted((c[1], c[3]))
+        cx, cy, rx, ry = (x1 + x2) / 2, (y1 + y2) / 2, (x2 - x1) / 2, (y2 - y1) / 2
+        fill = parse_color(item.options["fill"])
+        if fill is not None and rx > 0 and ry > 0:
+            box = self._clip(x1, y1, x2, y2)
+            if box is not None:
+                gx, gy = self._grid(box)
+                self._fill_mask(box, ((gx - cx) / rx) ** 2 + ((gy - cy) / ry) ** 2 <= 1, fill)
+        outline = parse_color(item.options["outline"])
+        half = float(item.options["width"]) / 2
+        if outline is None or half <= 0:
+            return
+        box = self._clip(x1 - half, y1 - half, x2 + half, y2 + half)
+        if box is None:
+            return
+        gx, gy = self._grid(box)
+        dx, dy = gx - cx, gy - cy
+        mask = (dx / (rx + half)) ** 2 + (dy / (ry + half)) ** 2 <= 1
+        if rx > half and ry > half:
+            mask &= (dx / (rx - half)) ** 2 + (dy / (ry - half)) ** 2 >= 1
+        self._fill_mask(box, mask, outline)
+
+    def _stroke(self, points, width, rgb):
+        """Draw the segments joining consecutive points with butt caps."""
+        half = max(width, 1) / 2
+        # Odd widths are centered on pixel centers, even widths on pixel edges
+        shift = 0.5 if int(max(width, 1)) % 2 else 0.0
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            ax, ay, bx, by = ax + shift, ay + shift, bx + shift, by + shift
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            if length2 == 0:
+                continue
+            box = self._clip(min(ax, bx) - half - 1, min(ay, by) - half - 1,
+                             max(ax, bx) + half + 1, max(ay, by) + half + 1)
+            if box is None:
+                continue
+            gx, gy = self._grid(box)
+            rx, ry = gx - ax, gy - ay
+            t = (rx * dx + ry * dy) / length2
+            distance = np.abs(rx * dy - ry * dx) / math.sqrt(length2)
+            self._fill_mask(box, (t >= 0) & (t < 1) & (distance < half), rgb)
+
+    def _draw_line(self, item):
+        rgb = parse_color(item.options["fill"])
+        c = item.coords
+        if rgb is not None:
+            self._stroke(list(zip(c[0::2], c[1::2])), float(item.options["width"]), rgb)
+
+    def _draw_polygon(self, item):
+        c = item.coords
+        points = list(zip(c[0::2], c[1::2]))
+        if len(points) < 2:
+            return
+        fill = parse_color(item.options["fill"])
+        if fill is not None and len(points) >= 3:
+            xs, ys = c[0::2], c[1::2]
+            box = self._clip(min(xs), min(ys), max(xs), max(ys))
+            if box is not None:
+                gx, gy = self._grid(box)
+                inside = np.zeros((box[3] - box[1], box[2] - box[0]), dtype=bool)
+                # Even-odd rule on pixel centers
+                xj, yj = points[-1]
+                for xi, yi in points:
+                    if yi != yj:
+                        crosses = (yi > gy) != (yj > gy)
+                        x_cross = (xj - xi) * (gy - yi) / (yj - yi) + xi
+                        inside ^= crosses & (gx < x_cross)
+                    xj, yj = xi, yi
+                self._fill_mask(box, inside, fill)
+        outline = parse_color(item.options["outline"])
+        if outline is not None:
+            self._stroke(points + points[:1], float(item.options["width"]), outline)
+
+    def text_layout(self, text, font):
+        """
+        Lay out text like a Tk text item.
+        Returns (pil_font, lines, width, height, line_height); pil_font is None without Pillow.
+        """
+        name, size = _parse_font(font)
+        pil_font = load_pil_font(name, size)
+        lines = str(text).split("\n")
+        if pil_font is None:
+            # Rough metrics so layouts still work without Pillow
+            pixels = -size if size < 0 else size * 96 / 72
+            line_height = int(math.ceil(pixels * 1.2))
+            width = int(math.ceil(max(len(line) for line in lines) * pixels * 0.6))
+        else:
+            ascent, descent = pil_font.getmetrics()
+            line_height = ascent + descent
+            width = int(math.ceil(max(pil_font.getlength(line) for line in lines)))
+        return pil_font, lines, width, line_height * len(lines), line_height
+
+    def _draw_text(self, item):
+        rgb = parse_color(item.options["fill"])
+        if rgb is None:
+            return
+        pil_font, lines, width, height, line_height = self.text_layout(item.options["text"], item.options["font"])
+        if pil_font is None or width == 0:
+            return
+        from PIL import Image, ImageDraw
+        mask = Image.new("L", (width, height))
+        draw = ImageDraw.Draw(mask)
+        for i, line in enumerate(lines):
+            draw.text((0, i * line_height), line, font=pil_font, fill=255)
+        rgba = np.empty((height, width, 4), dtype=np.uint8)
+        rgba[:, :, :3] = rgb
+        rgba[:, :, 3] = np.asarray(mask)
+        dx, dy = anchor_offset(item.options["anchor"], width, height)
+        self._blend(self._round(item.coords[0] + dx), self._round(item.coords[1] + dy), rgba)
+
+    def _image_pixels(self, image):
+        """RGB or RGBA array of an image option: a PIL image, a NumPy array or a Framebuffer."""
+        if image is None:
+            return None
+        if hasattr(image, "to_array"):
+            return image.to_array()
+        if isinstance(image, np.ndarray):
+            if image.ndim == 2:
+                return np.repeat(image[:, :, None], 3, axis=2)
+            return image
+        if hasattr(image, "mode"):
+            return np.asarray(image if image.mode in ("RGB", "RGBA") else image.convert("RGBA"))
+        return None
+
+    def _draw_image(self, item):
+        pixels = self._image_pixels(item.options["image"])
+        if pixels is None:
+            return
+        height, width = pixels.shape[:2]
+        dx, dy = anchor_offset(item.options["anchor"], width, height)
+        self._blend(self._round(item.coords[0] + dx), self._round(item.coords[1] + dy), pixels)
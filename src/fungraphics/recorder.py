@@ -0,0 +1,186 @@
+"""
+Frame recorder for FunGraphics.
+
+Frames are handed to a bounded queue and written by a background thread, so
+the game loop only pays for rendering the frame offscreen (with Tk, reading
+every canvas item back and rasterizing it) and copying the pixels. When the
+writer is behind under the "drop" policy, ready() tells the caller to skip
+the frame before it is rendered. Supported formats:
+
+- "png": one PNG file per frame. The path is a directory, or a pattern such
+  as "shots/frame_%05d.png".
+- "gif": one animated GIF. Frames are appended to the file as they are
+  written, each with its own 256 color palette.
+- "raw": packed RGB bytes, frame after frame, to a file or to any binary
+  stream (e.g. the stdin of an encoder). For instance with ffmpeg:
+  ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 30 -i frames.raw out.mp4
+"""
+import os
+import queue
+import threading
+import time
+
+FORMATS = ("png", "gif", "raw")
+POLICIES = ("drop", "block")
+
+_STOP = object()
+
+
+def format_from_path(path):
+    """Guess the recording format from a path: .gif, .raw/.rgb, otherwise PNG frames."""
+    if not isinstance(path, str):
+        return "raw"
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gif":
+        return "gif"
+    if extension in (".raw", ".rgb"):
+        return "raw"
+    return "png"
+
+
+class FrameRecorder:
+    def __init__(self, path, fps=30, format="png", queue_size=8, policy="drop"):
+        """
+        path: destination (see the module documentation)
+        fps: playback rate of the recording
+        queue_size: number of frames waiting for the writer at most
+        policy: what submit() does when the queue is full, "drop" the frame
+        or "block" until the writer catches up
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Unknown recording format: {format!r} (expected one of {FORMATS})")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown recording policy: {policy!r} (expected one of {POLICIES})")
+        self.path = path
+        self.fps = fps
+        self.format = format
+        self.policy = policy
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.max_queue_depth = 0
+        self.write_time = 0.0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._stream = None
+        self._owns_stream = False
+        if format == "png" and "%" not in path:
+            if not os.path.isdir(path) and os.path.splitext(path)[1]:
+                raise ValueError(f"PNG frames need a directory or a pattern such as \"frame_%05d.png\", "
+                                 f"not the file {path!r}")
+            os.makedirs(path, exist_ok=True)
+            self.path = os.path.join(path, "frame_%05d.png")
+        elif isinstance(path, str):
+            if format == "png":
+                try:
+                    path % 0
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid frame pattern: {path!r} (expected one %d, "
+                                     f"e.g. \"frame_%05d.png\")") from None
+            # Missing directories are created now rather than failing on the writer thread
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if format != "png":
+                self._stream = open(path, "wb")
+                self._owns_stream = True
+        else:
+            self._stream = path
+        self._thread = threading.Thread(target=self._run, name="FunGraphics recorder", daemon=True)
+        self._thread.start()
+
+    def ready(self):
+        """
+        False when the next frame would be dropped because the queue is full
+        (policy "drop"): the frame is counted as captured and dropped, and the
+        caller does not need to render it.
+        """
+        if self.policy == "drop" and self._queue.full():
+            self.frames_captured += 1
+            self.frames_dropped += 1
+            return False
+        return True
+
+    def submit(self, pixels):
+        """
+        Queue a frame (H x W x 3 uint8 array, not modified afterwards).
+        Returns False if it was dropped because the writer is behind.
+        """
+        self.frames_captured += 1
+        try:
+            self._queue.put(pixels, block=self.policy == "block")
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def close(self):
+        """Write the frames still queued, finish the file and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        return self.stats()
+
+    def stats(self):
+        """Recording statistics as a dictionary."""
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "write_time": self.write_time,
+            "error": self.error,
+        }
+
+    def _run(self):
+        while True:
+            pixels = self._queue.get()
+            if pixels is _STOP:
+                break
+            if self.error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                self._write(pixels)
+                self.frames_written += 1
+            except Exception as e:
+                self.error = str(e)
+                print(f"Recording failed: {e}")
+            self.write_time += time.perf_counter() - start
+        try:
+            self._finish()
+        except Exception as e:
+            self.error = str(e)
+            print(f"Recording failed: {e}")
+
+    def _write(self, pixels):
+        if self.format == "raw":
+            self._stream.write(pixels.tobytes())
+            return
+        from PIL import Image
+        image = Image.fromarray(pixels)
+        if self.format == "png":
+            image.save(self.path % self.frames_written, compress_level=1)
+            return
+        # Image.save(save_all=True) keeps every frame until the end: write them one by one
+        from PIL import GifImagePlugin
+        image = image.quantize(colors=256)
+        if self.frames_written == 0:
+            header, _ = GifImagePlugin.getheader(image, info={"loop": 0})
+            self._stream.write(b"".join(header))
+        duration = max(1, int(round(1000 / self.fps)))
+        for chunk in GifImagePlugin.getdata(image, duration=duration, include_color_table=True):
+            self._stream.write(chunk)
+
+    def _finish(self):
+        if self._stream is None:
+            return
+        if self.format == "gif" and self.frames_written:
+            self._stream.write(b";")  # GIF trailer
+        self._stream.flush()
+        if self._owns_stream:
+            self._stream.close()
+            if self.format == "gif" and not self.frames_written:
+                os.remove(self.path)  # an empty file would not be a valid GIF
@@ -1,38 +1,357 @@
-import tkinter as tk
+import importlib
 import os
+import sys
+import weakref
+from collections import OrderedDict
+
+# Memory budget of the image files shared by GraphicsBitmaps, see BitmapCache
+BITMAP_CACHE_BYTES = 128 * 1024 * 1024
+
+# Optional modules by name, imported on first use (None when not installed)
+_modules = {}
+
+def optional_import(name):
+    """
+    Import a module (e.g. "PIL.ImageTk") the first time it is needed and
+    remember it, so later calls are a dictionary lookup. Returns None when
+    the module is not installed, and remembers that too.
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _modules[name] = module
+    return module
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by a number of entries and/or a total size.
+    sizeof(value) gives the size of an entry, it is required with max_bytes.
+    """
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self._entries:
+            self.pop(key)
+        self._entries[key] = value
+        if self.sizeof is not None:
+            self.bytes += self.sizeof(value)
+        self._evict()
+
+    def pop(self, key, default=None):
+        if key not in self._entries:
+            return default
+        value = self._entries.pop(key)
+        if self.sizeof is not None:
+            self.bytes -= self.sizeof(value)
+        return value
+
+    def set_limits(self, max_entries=None, max_bytes=None):
+        """Change the bounds (None keeps the current one) and evict what no longer fits."""
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        # The most recent entry is always kept, even if it is bigger than the budget
+        while len(self._entries) > 1 and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            self.pop(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+def anchor_offset(anchor, width, height):
+    """Offset from a Tk anchor point to the top-left corner of a width x height box."""
+    if anchor in ("c", "center"):
+        return -width / 2, -height / 2
+    fx = 0 if "w" in anchor else (1 if "e" in anchor else 0.5)
+    fy = 0 if "n" in anchor else (1 if "s" in anchor else 0.5)
+    return -width * fx, -height * fy
+
+_pil_fonts = {}
+
+def load_pil_font(font_name, size):
+    """
+    Load a Pillow font matching a Tk font description.
+    size follows Tk: points when positive, pixels when negative.
+    Falls back to Pillow's default font when no font file matches, and
+    returns None when Pillow is not installed.
+    """
+    key = (font_name, size)
+    if key in _pil_fonts:
+        return _pil_fonts[key]
+    ImageFont = optional_import("PIL.ImageFont")
+    if ImageFont is None:
+        _pil_fonts[key] = None
+        return None
+    # Tk scales points to pixels at 96 dpi on common displays
+    pixels = -size if size < 0 else max(1, round(size * 96 / 72))
+    font = None
+    for candidate in (font_name, font_name + ".ttf", font_name.lower() + ".ttf",
+                      font_name.replace(" ", "") + ".ttf", "DejaVuSans.ttf"):
+        try:
+            font = ImageFont.truetype(candidate, pixels)
+            break
+        except OSError:
+            continue
+    if font is None:
+        try:
+            font = ImageFont.load_default(pixels)
+        except TypeError:
+            # Pillow < 10.1 only has a fixed size bitmap font
+            font = ImageFont.load_default()
+    _pil_fonts[key] = font
+    return font
+
+# Font files of font families, see font_file
+_font_files = {}
+
+def font_file(family):
+    """
+    The path of the font file fontconfig uses for a font family (fc-match),
+    or None when fontconfig is not available. Tk draws with fontconfig on
+    Linux, so Pillow then renders the same typeface as Tk.
+    """
+    if family in _font_files:
+        return _font_files[family]
+    path = None
+    import shutil
+    fc_match = shutil.which("fc-match")
+    if fc_match is not None:
+        import subprocess
+        try:
+            result = subprocess.run([fc_match, "--format=%{file}", family],
+                                    capture_output=True, text=True, timeout=5)
+            path = result.stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            path = None
+    _font_files[family] = path
+    return path
+
+def _resolve_path(filename_or_path):
+    # Check if it's a resource path (starts with /) or a file path
+    if filename_or_path.startswith("/"):
+        # Assuming resources are relative to the project root or src
+        # For now, let's try to find it relative to current working directory
+        # removing leading /
+        return filename_or_path.lstrip("/")
+    return filename_or_path
+
+def _load_bitmap(path):
+    """Decode an image file: (PIL image, None), or (None, PhotoImage) without Pillow."""
+    Image = optional_import("PIL.Image")
+    if Image is None:
+        # Fall back to tkinter PhotoImage
+        return None, optional_import("tkinter").PhotoImage(file=path)
+    pil_image = Image.open(path)
+    # Decode now, once for all the bitmaps sharing it (this also closes the file)
+    pil_image.load()
+    return pil_image, None
+
+def _photo_image(pil_image, image):
+    """
+    A PhotoImage of pil_image for the current Tk window: image if it belongs
+    to it, a new one if it is missing or was made for a window since closed.
+    Without a Tk window (headless backend), image is returned as is.
+    """
+    tkinter = sys.modules.get("tkinter")
+    root = getattr(tkinter, "_default_root", None)
+    if root is None or pil_image is None or (image is not None and image.tk is root.tk):
+        return image
+    try:
+        return optional_import("PIL.ImageTk").PhotoImage(pil_image)
+    except RuntimeError:
+        return image
+
+class _BitmapAsset:
+    """An image file decoded once and shared by the GraphicsBitmaps loading it."""
+    __slots__ = ("key", "pil_image", "image", "size", "refs")
+
+    def __init__(self, key, pil_image, image):
+        self.key = key
+        self.pil_image = pil_image
+        self.image = image
+        if pil_image is not None:
+            self.size = pil_image.width * pil_image.height * len(pil_image.getbands())
+        else:
+            self.size = image.width() * image.height() * 4
+        self.refs = 0
+
+class BitmapCache:
+    """
+    Image files shared by all the GraphicsBitmaps of the process, keyed by
+    real path, modification time and size (so an edited file is loaded
+    again). Each asset counts the bitmaps using it; once none does, it is kept
+    for later loads until the total size goes over max_bytes, the least
+    recently released first. Assets in use are never dropped.
+    """
+    def __init__(self, max_bytes):
+        import threading
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._assets = {}            # key -> _BitmapAsset, in use or not
+        self._unused = OrderedDict() # key -> _BitmapAsset used by no bitmap, oldest first
+        # Bitmaps may be loaded on other threads, and released by the garbage collector
+        self._lock = threading.Lock()
+
+    def acquire(self, path):
+        """The asset of an image file, loaded if needed; release it when done."""
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            asset = self._assets.get(key)
+            if asset is not None:
+                return self._use(asset)
+        # Decode without holding the lock: other threads may load other files
+        asset = _BitmapAsset(key, *_load_bitmap(path))
+        with self._lock:
+            if key in self._assets:
+                # Loaded by another thread meanwhile
+                return self._use(self._assets[key])
+            self.misses += 1
+            # Older versions of the file are not needed by new bitmaps anymore
+            for stale in [k for k in self._unused if k[0] == key[0]]:
+                self._remove(stale)
+            self._assets[key] = asset
+            self.bytes += asset.size
+            asset.refs = 1
+            self._evict()
+        return asset
+
+    def _use(self, asset):
+        self.hits += 1
+        self._unused.pop(asset.key, None)
+        asset.refs += 1
+        return asset
+
+    def release(self, asset):
+        """A bitmap stopped using an asset."""
+        with self._lock:
+            asset.refs -= 1
+            if asset.refs == 0 and self._assets.get(asset.key) is asset:
+                self._unused[asset.key] = asset
+                self._evict()
+
+    def invalidate(self, path=None):
+        """Forget a file (all files with no path): the next bitmaps load it again."""
+        real_path = None if path is None else os.path.realpath(path)
+        with self._lock:
+            for key in [k for k in self._assets if real_path is None or k[0] == real_path]:
+                self._remove(key)
+
+    def set_limit(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {"assets": len(self._assets), "in_use": len(self._assets) - len(self._unused),
+                    "bytes": self.bytes, "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def _remove(self, key):
+        asset = self._assets.pop(key)
+        self._unused.pop(key, None)
+        self.bytes -= asset.size
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._unused:
+            self._remove(next(iter(self._unused)))
+            self.evictions += 1
+
+_bitmap_cache = None
+
+def bitmap_cache():
+    """The BitmapCache of the process, created on first use."""
+    global _bitmap_cache
+    if _bitmap_cache is None:
+        _bitmap_cache = BitmapCache(BITMAP_CACHE_BYTES)
+    return _bitmap_cache
 
 class GraphicsBitmap:
-    def __init__(self, filename_or_path):
+    def __init__(self, filename_or_path, shared=True):
         """
         Loads an image from a file.
+        shared: use the pixels already loaded by other GraphicsBitmaps of the
+        same (unchanged) file instead of decoding it again; they must then not
+        be modified. See invalidateCache.
         """
-        # Check if it's a resource path (starts with /) or a file path
-        if filename_or_path.startswith("/"):
-             # Assuming resources are relative to the project root or src
-             # For now, let's try to find it relative to current working directory
-             # removing leading /
-             path = filename_or_path.lstrip("/")
-        else:
-            path = filename_or_path
+        path = _resolve_path(filename_or_path)
         
         self.image = None
         self.pil_image = None
+        # Shared file (None when not shared), also the key of cached transformations
+        self.asset = None
         
         try:
-            # Try to load with PIL first for better format support and transformations
-            try:
-                from PIL import Image, ImageTk
-                self.pil_image = Image.open(path)
-                self.image = ImageTk.PhotoImage(self.pil_image)
-            except ImportError:
-                # Fall back to tkinter PhotoImage
-                self.image = tk.PhotoImage(file=path)
+            if shared:
+                cache = bitmap_cache()
+                asset = cache.acquire(path)
+                weakref.finalize(self, cache.release, asset)
+                self.asset = asset
+                asset.image = _photo_image(asset.pil_image, asset.image)
+                self.pil_image, self.image = asset.pil_image, asset.image
+            else:
+                self.pil_image, self.image = _load_bitmap(path)
+                self.image = _photo_image(self.pil_image, self.image)
         except Exception as e:
             print(f"Error: Image not found or format not supported at {path}. {e}")
             # Create a placeholder or leave as None
             # Tkinter PhotoImage is hard to create programmatically without data
             # We will handle None in drawPicture
 
+    @staticmethod
+    def invalidateCache(path=None):
+        """
+        Forget the shared pixels of an image file (of all files without path),
+        e.g. to reload an asset edited while the program runs. Edits that change
+        the file's modification time or size are noticed without this.
+        Bitmaps already loaded keep their pixels.
+        """
+        bitmap_cache().invalidate(None if path is None else _resolve_path(path))
+
+    @staticmethod
+    def configureCache(max_bytes):
+        """Memory budget of the shared image files, in bytes (files in use are always kept)."""
+        bitmap_cache().set_limit(max_bytes)
+
+    @staticmethod
+    def getCacheStats():
+        """Shared image files: count, in use, bytes, max_bytes, hits, misses and evictions."""
+        return bitmap_cache().stats()
+
     def getWidth(self):
         if self.pil_image:
             return self.pil_image.width